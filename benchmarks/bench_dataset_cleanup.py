@@ -0,0 +1,158 @@
+"""
+Benchmark for DatasetCleanupManager.clean_dataset.
+
+Generates synthetic phone documents shaped like app.products (price_history,
+url, name and a specifications map with the keys the model uses, plus
+missing values, unknown answers, malformed numbers and a long tail of
+unrelated specification keys). Compares the legacy path - DataFrame of the
+whole documents, json_normalize of every specification key, then the
+column-by-column extract/clean code - with clean_dataset, which pulls only
+the spec's keys into arrays and cleans them in a single pass. Checks that
+both produce identical frames and reports rows/second and peak heap.
+
+Usage:
+    python benchmarks/bench_dataset_cleanup.py [--rows 100000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'pipeline'))
+import pandas as pd
+from regression_manager.dataset_cleanup_manager import DatasetCleanupManager
+
+
+def synthetic_phone(index, rng):
+    def maybe(value):
+        return None if rng.random() < 0.05 else value
+
+    specifications = {
+        '5G': maybe(rng.choice(['Da', 'Nu'])),
+        '4G': maybe(rng.choice(['Da', 'Nu', 'Optional'])),
+        'Rezolutie maxima (px)': maybe(rng.choice(['1080 x 2400', '720 x 1600', '1440 x 3200', 'Full HD'])),
+        'Diagonala (inch)': maybe(rng.choice(['6.1', '6.5', '6.7', '6,7'])),
+        'Numar nuclee': maybe(rng.choice(['8 (2+6)', '8', '6 (2+4)', 'Octa-core'])),
+        'Memorie Flash': maybe(f"{rng.choice([64, 128, 256, 512])} GB"),
+        'Memorie RAM': maybe(f"{rng.choice([4, 6, 8, 12])} GB"),
+        'Incarcare Wireless': maybe(rng.choice(['Da', 'Nu'])),
+        'Capacitate': maybe(f"{rng.randint(3000, 6000)} mAh"),
+        'Dual SIM': maybe(rng.choice(['Da', 'Nu'])),
+        'Culoare': rng.choice(['Negru', 'Alb', 'Albastru']),
+    }
+    # Long tail of keys that only some products have, widening the normalized frame
+    for _ in range(20):
+        specifications[f'Caracteristica {rng.randint(0, 300)}'] = rng.choice(['Da', 'Nu', 'Standard'])
+    return {
+        'product_code': f'P{index:07d}',
+        'name': f'Telefon {index}',
+        'url': f'https://www.evomag.ro/telefoane/telefon-{index}',
+        'price': round(rng.uniform(300, 8000), 2),
+        'price_history': [{'price': round(rng.uniform(300, 8000), 2), 'timestamp': '2024_11_13_10_00'} for _ in range(30)],
+        'specifications': {key: value for key, value in specifications.items() if value is not None},
+    }
+
+
+def legacy_flatten_json_column(df, json_column):
+    result_df = df.copy()
+    mask = result_df[json_column].notna()
+    if mask.any():
+        normalized_df = pd.json_normalize(result_df.loc[mask, json_column])
+        result_subset = result_df.loc[mask].drop(json_column, axis=1)
+        flattened_subset = pd.concat([result_subset.reset_index(drop=True),
+                                      normalized_df.reset_index(drop=True)], axis=1)
+        if (~mask).any():
+            result_df = pd.concat([flattened_subset, result_df.loc[~mask]]).sort_index()
+        else:
+            result_df = flattened_subset
+    return result_df
+
+
+def legacy_extract_features(df_smartphone_normalised):
+    df_model_training = pd.DataFrame()
+    df_model_training['5G'] = df_smartphone_normalised['5G']
+    df_model_training['4G'] = df_smartphone_normalised['4G']
+    df_model_training[['resolution width', 'resolution height']] = df_smartphone_normalised['Rezolutie maxima (px)'].str.split(' x ', expand=True)
+    df_model_training['Diagonala'] = df_smartphone_normalised['Diagonala (inch)']
+    df_model_training['Numar nuclee'] = df_smartphone_normalised['Numar nuclee']
+    df_model_training['Memorie Flash'] = df_smartphone_normalised['Memorie Flash']
+    df_model_training['Memorie RAM'] = df_smartphone_normalised['Memorie RAM']
+    df_model_training['Incarcare Wireless'] = df_smartphone_normalised['Incarcare Wireless']
+    df_model_training['Capacitate Baterie'] = df_smartphone_normalised['Capacitate']
+    df_model_training['Dual SIM'] = df_smartphone_normalised['Dual SIM']
+    df_model_training['price'] = df_smartphone_normalised['price']
+    return df_model_training
+
+
+def legacy_clean_features(df_model_training):
+    df_cleaned = df_model_training.copy()
+    for column in ['5G', '4G']:
+        df_cleaned[column].fillna(0, inplace=True)
+        df_cleaned[column].replace('Da', 1, inplace=True)
+        df_cleaned[column].replace('Nu', 0, inplace=True)
+    df_cleaned['resolution width'] = pd.to_numeric(df_cleaned['resolution width'], errors='coerce')
+    df_cleaned['resolution height'] = pd.to_numeric(df_cleaned['resolution height'], errors='coerce')
+    df_cleaned['resolution height'].fillna(0, inplace=True)
+    df_cleaned['resolution width'].fillna(0, inplace=True)
+    df_cleaned['Diagonala'] = pd.to_numeric(df_cleaned['Diagonala'], errors='coerce')
+    df_cleaned['Diagonala'].fillna(0, inplace=True)
+    df_cleaned['Numar nuclee'] = df_cleaned['Numar nuclee'].str.split('(').str[0]
+    df_cleaned['Numar nuclee'] = pd.to_numeric(df_cleaned['Numar nuclee'], errors='coerce')
+    df_cleaned['Numar nuclee'].fillna(0, inplace=True)
+    for column in ['Memorie RAM', 'Memorie Flash', 'Capacitate Baterie']:
+        df_cleaned[column] = df_cleaned[column].str.split(' ').str[0]
+        df_cleaned[column] = pd.to_numeric(df_cleaned[column], errors='coerce')
+        df_cleaned[column].fillna(0, inplace=True)
+    for column in ['Incarcare Wireless', 'Dual SIM']:
+        df_cleaned[column].fillna(0, inplace=True)
+        df_cleaned[column].replace('Da', 1, inplace=True)
+        df_cleaned[column].replace('Nu', 0, inplace=True)
+    return df_cleaned.drop('price', axis=1)
+
+
+def measure(label, func, rows, repeat):
+    began = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - began) / repeat
+
+    # Separate run for the heap, tracemalloc slows every allocation down
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:>22}: {rows / elapsed:12.0f} rows/s, {elapsed * 1000:8.1f} ms, peak heap {peak / 2**20:7.1f} MiB')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark DatasetCleanupManager.clean_dataset')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    products = [synthetic_phone(index, rng) for index in range(args.rows)]
+    manager = DatasetCleanupManager()
+
+    def legacy():
+        df_flattened = legacy_flatten_json_column(pd.DataFrame(products), 'specifications')
+        return legacy_clean_features(legacy_extract_features(df_flattened))
+
+    print(f'--- {args.rows} synthetic phones ---')
+    with warnings.catch_warnings():
+        # The legacy code relies on chained inplace calls that pandas warns about
+        warnings.simplefilter('ignore')
+        legacy = measure('legacy flatten + clean', legacy, args.rows, args.repeat)
+    current = measure('clean_dataset', lambda: manager.clean_dataset(products), args.rows, args.repeat)
+
+    pd.testing.assert_frame_equal(legacy, current)
+    print('outputs identical')
+
+
+if __name__ == '__main__':
+    main()
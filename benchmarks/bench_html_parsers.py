@@ -0,0 +1,84 @@
+"""
+Micro-benchmark for the HTML parser backends.
+
+Parses the saved evomag/vexio listing and detail fixtures with every
+available backend, checks that all backends extract identical fields and
+reports listing items/second and detail pages/second. The legacy row uses
+html.parser with the full `no_nav_strings(element.descendants)` walk.
+
+Usage:
+    python benchmarks/bench_html_parsers.py [--repeat 20]
+"""
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+
+sys.path.append(os.path.join(ROOT, 'scrapers'))
+from bs4 import NavigableString
+from common.html_parser import available_backends, make_soup, first_tag
+sys.path.append(os.path.join(ROOT, 'scrapers', 'evomag'))
+import evomag_parser
+sys.path.append(os.path.join(ROOT, 'scrapers', 'vexio'))
+import vexio_parser
+
+RETAILERS = [
+    ('evomag', evomag_parser, {'class_': 'nice_product_item'}),
+    ('vexio', vexio_parser, {'class_': 'grid-full col-xs-8 col-sm-4 col-md-4'}),
+]
+
+
+def legacy_first_tag(element):
+    return list(filter(lambda x: type(x) != NavigableString, element.descendants))[0]
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def parse_listing(markup, parser, item_filter, backend, find_first):
+    soup = make_soup(markup, backend)
+    return [parser.parse_listing_item(find_first(element)) for element in soup.find_all(**item_filter)]
+
+
+def timed(func, repeat):
+    began = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML parser backends on saved fixtures')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    variants = [('html.parser (legacy walk)', 'html.parser', legacy_first_tag)]
+    variants += [(backend, backend, first_tag) for backend in available_backends()]
+
+    for retailer, retailer_parser, item_filter in RETAILERS:
+        listing_markup = read_fixture(f'{retailer}_listing.html')
+        detail_markup = read_fixture(f'{retailer}_product.html')
+        reference = None
+
+        print(f'--- {retailer} ---')
+        for label, backend, find_first in variants:
+            items, listing_time = timed(
+                lambda: parse_listing(listing_markup, retailer_parser, item_filter, backend, find_first), args.repeat)
+            details, detail_time = timed(
+                lambda: retailer_parser.parse_product_page(make_soup(detail_markup, backend)), args.repeat)
+
+            if reference is None:
+                reference = (items, details)
+            assert (items, details) == reference, f'{label} extracted different fields for {retailer}'
+
+            print(f'{label:>26}: {len(items) * args.repeat / listing_time:9.1f} listing items/s, '
+                  f'{args.repeat / detail_time:7.1f} detail pages/s')
+
+
+if __name__ == '__main__':
+    main()
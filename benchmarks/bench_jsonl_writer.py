@@ -0,0 +1,100 @@
+"""
+Benchmark for the scraper output sink.
+
+Writes synthetic products in batches of 10 and reports the per-batch write
+cost as the daily file grows, for both the append-only JSONL writer and the
+legacy read-extend-rewrite JSON array approach.
+
+Usage:
+    python benchmarks/bench_jsonl_writer.py [--products 100000] [--legacy-products 5000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scrapers'))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pipeline'))
+from common.jsonl_writer import JsonlWriter
+from utils.os_utils import OsUtils
+
+BATCH_SIZE = 10
+
+
+def make_product(i):
+    return {
+        'timestamp': '2025_06_22_15_23',
+        'name': f'Telefon mobil test {i}, Dual SIM, 128GB, 8GB RAM',
+        'price': 1000 + i % 500 + 0.99,
+        'rating': i % 6,
+        'number_of_reviews': i % 40,
+        'is_in_stoc': i % 2,
+        'url': f'https://www.evomag.ro/telefoane/produs-{i}.html',
+        'product_code': f'CODE{i:08d}',
+        'online_mag': 'evomag',
+        'specifications': {f'Specificatie {k}': f'Valoare {k}' for k in range(25)},
+        'manufacturer': 'Test',
+        'category': 'Telefoane',
+    }
+
+
+def legacy_write_batch(output_file, batch_data):
+    with open(output_file, 'r') as f:
+        existing_data = json.load(f)
+    existing_data.extend(batch_data)
+    with open(output_file, 'w') as f:
+        json.dump(existing_data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def run(write_batch, total_products, checkpoints):
+    timings = {}
+    window = []
+    for start in range(0, total_products, BATCH_SIZE):
+        batch = [make_product(i) for i in range(start, start + BATCH_SIZE)]
+        began = time.perf_counter()
+        write_batch(batch)
+        window.append(time.perf_counter() - began)
+
+        written = start + BATCH_SIZE
+        if written in checkpoints:
+            # mean of the last 100 batches around each checkpoint
+            timings[written] = sum(window[-100:]) / len(window[-100:])
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scraper output sinks')
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--legacy-products', type=int, default=5000)
+    args = parser.parse_args()
+
+    checkpoints = {n for n in (1000, 5000, 10000, 25000, 50000, 100000, args.products, args.legacy_products)}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jsonl_path = os.path.join(tmp_dir, 'evomag_bench.jsonl')
+        with JsonlWriter(jsonl_path) as writer:
+            jsonl_timings = run(writer.write_batch, args.products, checkpoints)
+
+        began = time.perf_counter()
+        read_count = sum(1 for _ in OsUtils.streamFromJsonFile([jsonl_path]))
+        read_time = time.perf_counter() - began
+
+        legacy_path = os.path.join(tmp_dir, 'evomag_bench.json')
+        with open(legacy_path, 'w') as f:
+            json.dump([], f)
+        legacy_timings = run(lambda batch: legacy_write_batch(legacy_path, batch), args.legacy_products, checkpoints)
+
+    print(f"{'products in file':>18} | {'jsonl ms/batch':>15} | {'legacy ms/batch':>16}")
+    for n in sorted(set(jsonl_timings) | set(legacy_timings)):
+        jsonl_ms = f"{jsonl_timings[n] * 1000:.3f}" if n in jsonl_timings else '-'
+        legacy_ms = f"{legacy_timings[n] * 1000:.3f}" if n in legacy_timings else '-'
+        print(f"{n:>18} | {jsonl_ms:>15} | {legacy_ms:>16}")
+    print(f"Streamed back {read_count} products in {read_time:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
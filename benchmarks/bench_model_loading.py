@@ -0,0 +1,121 @@
+"""
+Benchmark for loading the price model in the prediction worker processes.
+
+Loads the same forest in several concurrent spawn processes, as the prediction
+stage's pool does, once per artifact format:
+- pickle: the legacy random_forest_model.pkl
+- joblib-mmap: joblib.dump of the model, loaded with mmap_mode='r'
+- forest-artifact: ForestArtifact directory (flat node arrays, np.load mmap)
+Every worker loads the model, scores a batch, then reports the load time and its
+Rss and Pss (resident memory with shared pages split between the processes that
+map them, from /proc/self/smaps_rollup, so Linux only) while all workers are alive.
+
+Without --model a synthetic forest shaped like the phone model is trained.
+
+Usage:
+    python benchmarks/bench_model_loading.py [--model random_forest_model.pkl] [--workers 4] [--trees 200]
+"""
+import os
+import sys
+import time
+import pickle
+import argparse
+import tempfile
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'pipeline'))
+import joblib
+import numpy as np
+from regression_manager.forest_artifact import ForestArtifact
+
+
+def memory_mb():
+    memory = {}
+    with open('/proc/self/smaps_rollup', 'r') as smaps:
+        for line in smaps:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                memory[parts[0][:-1].lower()] = int(parts[1]) / 1024
+    return memory
+
+
+def load(fmt, path):
+    if fmt == 'pickle':
+        with open(path, 'rb') as model_file:
+            return pickle.load(model_file)
+    if fmt == 'joblib-mmap':
+        return joblib.load(path, mmap_mode='r')
+    return ForestArtifact(path)
+
+
+def worker(fmt, path, n_features, barrier, results):
+    baseline = memory_mb()
+    began = time.perf_counter()
+    model = load(fmt, path)
+    load_s = time.perf_counter() - began
+    model.predict(np.random.default_rng(0).random((1000, n_features)))
+
+    # Measure while every worker holds its model, so shared pages are split between them
+    barrier.wait()
+    memory = memory_mb()
+    results.put({
+        'load_s': load_s,
+        'rss': memory['rss'] - baseline['rss'],
+        'pss': memory['pss'] - baseline['pss'],
+    })
+    barrier.wait()
+
+
+def run(fmt, path, n_features, workers):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(fmt, path, n_features, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', help='Pickled forest regressor (default: train a synthetic one)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--trees', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.model:
+            with open(args.model, 'rb') as model_file:
+                model = pickle.load(model_file)
+            pickle_path = args.model
+        else:
+            from sklearn.ensemble import RandomForestRegressor
+            rng = np.random.default_rng(0)
+            features, prices = rng.random((20000, 11)), rng.uniform(300, 8000, 20000)
+            model = RandomForestRegressor(n_estimators=args.trees, n_jobs=-1, random_state=0).fit(features, prices)
+            pickle_path = os.path.join(tmp, 'model.pkl')
+            with open(pickle_path, 'wb') as model_file:
+                pickle.dump(model, model_file)
+
+        joblib_path = os.path.join(tmp, 'model.joblib')
+        joblib.dump(model, joblib_path)
+        artifact_path = os.path.join(tmp, 'model')
+        meta = ForestArtifact.export(model, artifact_path)
+        print(f"{meta['n_trees']} trees, {meta['n_nodes']} nodes, pickle {os.path.getsize(pickle_path) / 2**20:.1f} MiB, "
+              f"{args.workers} workers")
+
+        print(f"{'format':<16} {'load ms':>9} {'rss MiB/worker':>15} {'pss MiB/worker':>15} {'pss MiB total':>14}")
+        for fmt, path in (('pickle', pickle_path), ('joblib-mmap', joblib_path), ('forest-artifact', artifact_path)):
+            reports = run(fmt, path, model.n_features_in_, args.workers)
+            load_ms = 1000 * sum(report['load_s'] for report in reports) / len(reports)
+            rss = sum(report['rss'] for report in reports) / len(reports)
+            pss = sum(report['pss'] for report in reports)
+            print(f"{fmt:<16} {load_ms:>9.1f} {rss:>15.1f} {pss / len(reports):>15.1f} {pss:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark for MongoManager collection reads.
+
+Seeds a collection with synthetic product documents (price_history and a
+specifications map, like app.products) and compares the legacy
+fetch_collection_filtered (list + json_util dumps/loads) with the
+stream_collection variants: whole documents, a projection of the fields
+the prediction stage needs, and lazily decoded raw BSON. Reports
+documents/second and the peak Python heap of each variant.
+
+Needs a running MongoDB; the benchmark database is dropped with --drop.
+
+Usage:
+    python benchmarks/bench_mongo_fetch.py [--connection-string mongodb://127.0.0.1:27017]
+                                           [--documents 100000] [--batch-size 1000] [--drop]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'pipeline'))
+from pymongo import MongoClient
+from database_manager.database_manager import MongoManager
+
+DB_NAME = 'bench_mongo_fetch'
+COLLECTION_NAME = 'products'
+PROJECTION = {'_id': 0, 'product_code': 1, 'online_mag': 1, 'price': 1, 'specifications': 1}
+
+
+def synthetic_product(index, rng):
+    start = datetime(2024, 11, 1)
+    return {
+        'timestamp': start.strftime('%Y_%m_%d_%H_%M'),
+        'name': f'Telefon mobil model {index}',
+        'price': round(rng.uniform(300, 8000), 2),
+        'rating': rng.randint(0, 5),
+        'number_of_reviews': rng.randint(0, 500),
+        'is_in_stoc': rng.randint(0, 1),
+        'url': f'https://www.evomag.ro/telefoane/model-{index}',
+        'product_code': f'P{index:07d}',
+        'online_mag': rng.choice(['evomag', 'vexio']),
+        'manufacturer': rng.choice(['Samsung', 'Apple', 'Xiaomi', 'Motorola']),
+        'category': 'Telefoane',
+        'specifications': {
+            'Memorie RAM': f'{rng.choice([4, 6, 8, 12])} GB',
+            'Memorie Flash': f'{rng.choice([64, 128, 256])} GB',
+            'Diagonala': f'{rng.uniform(5.5, 7.0):.1f}',
+            'Numar nuclee': '8 (2+6)',
+            '5G': rng.choice(['Da', 'Nu']),
+            'Rezolutie': '1080 x 2400',
+        },
+        'price_history': [
+            {'price': round(rng.uniform(300, 8000), 2), 'timestamp': (start + timedelta(days=day)).strftime('%Y_%m_%d_%H_%M')}
+            for day in range(30)
+        ],
+        'updatedAt': start,
+    }
+
+
+def seed(collection, documents):
+    if collection.estimated_document_count() == documents:
+        return
+    collection.drop()
+    rng = random.Random(0)
+    batch = []
+    for index in range(documents):
+        batch.append(synthetic_product(index, rng))
+        if len(batch) == 5000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def measure(label, func, documents):
+    tracemalloc.start()
+    began = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - began
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert count == documents, f'{label} returned {count} documents'
+    print(f'{label:>28}: {count / elapsed:10.0f} docs/s, {elapsed:6.2f} s, peak heap {peak / 2**20:8.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MongoManager collection reads')
+    parser.add_argument('--connection-string', default='mongodb://127.0.0.1:27017')
+    parser.add_argument('--documents', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--drop', action='store_true', help='drop the benchmark database afterwards')
+    args = parser.parse_args()
+
+    client = MongoClient(args.connection_string)
+    seed(client[DB_NAME][COLLECTION_NAME], args.documents)
+    manager = MongoManager(args.connection_string)
+
+    def legacy():
+        return len(manager.fetch_collection_filtered(DB_NAME, COLLECTION_NAME, {}))
+
+    def stream_whole():
+        return sum(1 for _ in manager.stream_collection(DB_NAME, COLLECTION_NAME, batch_size=args.batch_size))
+
+    def stream_projected():
+        return sum(1 for _ in manager.stream_collection(DB_NAME, COLLECTION_NAME, projection=PROJECTION, batch_size=args.batch_size))
+
+    def stream_raw():
+        # Touch one field per document so the lazy decode is part of the measurement
+        return sum(1 for document in manager.stream_collection(DB_NAME, COLLECTION_NAME, batch_size=args.batch_size, raw=True)
+                   if document['product_code'])
+
+    print(f'--- {args.documents} documents, batch size {args.batch_size} ---')
+    measure('legacy json_util round trip', legacy, args.documents)
+    measure('stream', stream_whole, args.documents)
+    measure('stream + projection', stream_projected, args.documents)
+    measure('stream raw BSON', stream_raw, args.documents)
+
+    if args.drop:
+        client.drop_database(DB_NAME)
+
+
+if __name__ == '__main__':
+    main()
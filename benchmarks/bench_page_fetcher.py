@@ -0,0 +1,110 @@
+"""
+Offline harness for the product detail fetcher.
+
+Serves the saved HTML fixtures from a local HTTP server, checks that both
+retailer parsers extract the expected fields, and measures pages/second on
+the pooled HTTP path and on the Selenium path (skipped when no browser is
+available).
+
+Usage:
+    python benchmarks/bench_page_fetcher.py [--pages 500] [--driver-pages 20]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+
+sys.path.append(os.path.join(ROOT, 'scrapers'))
+from common.page_fetcher import PageFetcher
+sys.path.append(os.path.join(ROOT, 'scrapers', 'evomag'))
+from evomag_parser import parse_product_page as parse_evomag
+sys.path.append(os.path.join(ROOT, 'scrapers', 'vexio'))
+from vexio_parser import parse_product_page as parse_vexio
+
+CASES = [
+    ('evomag', 'evomag_product.html', parse_evomag, 'product_codes'),
+    ('vexio', 'vexio_product.html', parse_vexio, None),
+]
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    handler = functools.partial(QuietHandler, directory=FIXTURES)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def create_headless_driver():
+    from selenium import webdriver
+    from selenium.webdriver.firefox.options import Options
+
+    options = Options()
+    options.add_argument('--headless')
+    options.page_load_strategy = 'eager'
+    return webdriver.Firefox(options=options)
+
+
+def measure(fetch, url, parse, pages):
+    began = time.perf_counter()
+    for _ in range(pages):
+        fetch(url, parse)
+    return pages / (time.perf_counter() - began)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the detail page fetcher against local fixtures')
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--driver-pages', type=int, default=20)
+    args = parser.parse_args()
+
+    server = start_server()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/'
+
+    try:
+        driver = create_headless_driver()
+    except Exception as e:
+        print(f'Selenium path skipped: {str(e).strip()}')
+        driver = None
+
+    try:
+        for retailer, fixture, parse, wait_for_class in CASES:
+            url = base_url + fixture
+            fetcher = PageFetcher(wait_for_class=wait_for_class)
+
+            details = fetcher.fetch_http(url, parse)
+            assert details['product_code'] == 'SM-A556BZKAEUE', details
+            assert details['specifications'], details
+
+            http_rate = measure(fetcher.fetch_http, url, parse, args.pages)
+            print(f'{retailer}: http   {http_rate:8.1f} pages/s over {args.pages} pages')
+
+            if driver is not None:
+                assert fetcher.fetch_driver(url, parse, driver) == details
+                driver_rate = measure(lambda u, p: fetcher.fetch_driver(u, p, driver), url, parse, args.driver_pages)
+                print(f'{retailer}: driver {driver_rate:8.1f} pages/s over {args.driver_pages} pages '
+                      f'({http_rate / driver_rate:.1f}x slower than http)')
+
+            print(f'{retailer}: {fetcher.report()}')
+            fetcher.close()
+    finally:
+        if driver is not None:
+            driver.quit()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -19,10 +19,12 @@
           requests
           selenium
           beautifulsoup4
+          lxml
           configparser
           psycopg2
           scikit-learn
           pymongo  # Python MongoDB driver
+          psutil
           
           # From shell.nix
           pip
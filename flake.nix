@@ -20,10 +20,12 @@
           requests
           selenium
           beautifulsoup4
+          lxml
           configparser
           psycopg2
           scikit-learn
           pymongo  # Python MongoDB driver
+          psutil
         ]);
       in
       {
@@ -1,13 +1,140 @@
+import re
 import json
-from bson import json_util
+import hashlib
+from collections import Counter
+from itertools import islice
+from bson import json_util, ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from pymongo import MongoClient, UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError, PyMongoError
 from datetime import datetime
 
 class MongoManager:
     __clinet : MongoClient
+    # Fields that change on every scrape and are not compared by change-aware upserts
+    __VOLATILE_FIELDS = ("timestamp",)
+    # Moving the model version aside when the specifications change makes the product a
+    # prediction candidate again, while keeping the version its feature hash belongs to
+    __STALE_PREDICTION = {"prediction_model_version": "prediction_stale_model_version"}
+    # Markers of the completed one-time migrations, one document per migration
+    __MIGRATIONS = "migrations"
+    # Indexes required by the pipeline's queries, per collection: (name, keys, options)
+    INDEXES = {
+        "products": [
+            # Upsert filter, and product_code lookups through the prefix
+            ("product_code_online_mag", [("product_code", 1), ("online_mag", 1)], {"unique": True}),
+            # CategoryStandardizer (online_mag, category) and the prediction stage filter
+            ("online_mag_category_prediction_model_version", [("online_mag", 1), ("category", 1), ("prediction_model_version", 1)], {}),
+            # Products scraped on a given day, the price drop feed's first stage
+            ("timestamp", [("timestamp", 1)], {}),
+        ],
+        "notification_outbox": [
+            # Dedup of (user, product_code, online_mag, price point) across every message
+            ("items_key", [("items.key", 1)], {"unique": True}),
+            # One digest per user per date
+            ("user_date", [("user", 1), ("date", 1)], {"unique": True}),
+            # Draining the pending messages in _id order
+            ("status_id", [("status", 1), ("_id", 1)], {}),
+        ],
+    }
+    # Representative queries issued by the pipeline, checked by explain_queries: (name, collection, filter)
+    PIPELINE_QUERIES = [
+        ("upsert", "products", {"product_code": "0", "online_mag": "evomag"}),
+        ("check_products", "products", {"product_code": "0"}),
+        ("predict_registered_categories", "products", {"prediction_model_version": {"$ne": "0"}, "category": "Telefoane", "online_mag": "evomag"}),
+        ("category_standardizer", "products", {"online_mag": "vexio", "category": "Telefoane"}),
+        ("train_model", "products", {"category": "Telefoane", "price": {"$gt": 0}, "online_mag": "evomag"}),
+        ("materialize_price_drops", "products", {"timestamp": {"$regex": "^2024_11_13"}}),
+    ]
 
-    def __init__(self, conn_string:str):
+    def __init__(self, conn_string:str, history_collection:str = None, history_limit:int = None):
+        """
+        Parameters:
+        conn_string (str): MongoDB connection string
+        history_collection (str): Time-series collection that receives every price point, or None to only keep the embedded price_history
+        history_limit (int): Number of points kept in the embedded price_history array once migrate_embedded_price_history has run, or None for no cap
+        """
         self.__clinet = MongoClient(conn_string)
+        self.__history_collection = history_collection
+        self.__history_limit = history_limit
+        self.__history_ready = set()
+        self.__history_migrated = set()
+        self.__snapshots = {}
+        self.__upsert_stats = Counter()
+
+    def ensure_indexes(self, db_name:str) -> tuple[list[str], dict]:
+        """
+        Creates the indexes declared in INDEXES if they do not exist yet. Every index is
+        attempted even when another one fails, e.g. the unique (product_code, online_mag)
+        index while the collection still holds duplicates of that pair.
+        
+        The unique indexes enforce correctness (upsert identity, notification dedup), so
+        if any of them could not be created a RuntimeError listing every failure is
+        raised once all indexes were attempted.
+        
+        Parameters:
+        db_name (str): The name of the database
+        
+        Returns:
+        tuple: Names of the ensured indexes, and a dict of "collection.index" -> error
+            for the indexes that could not be created
+        """
+        db = self.__clinet[db_name]
+        ensured = []
+        failed = {}
+        unique_failed = []
+        for collection_name, indexes in self.INDEXES.items():
+            for name, keys, options in indexes:
+                try:
+                    ensured.append(db[collection_name].create_index(keys, name=name, **options))
+                except PyMongoError as e:
+                    failed[f"{collection_name}.{name}"] = str(e)
+                    if options.get("unique"):
+                        unique_failed.append(f"{collection_name}.{name}")
+        
+        if unique_failed:
+            raise RuntimeError(
+                f"Could not create unique indexes {', '.join(unique_failed)}: "
+                + "; ".join(f"{name}: {error}" for name, error in failed.items())
+            )
+        return ensured, failed
+
+    def explain_queries(self, db_name:str) -> list[dict]:
+        """
+        Runs explain() on every query in PIPELINE_QUERIES and reports its winning plan.
+        
+        Parameters:
+        db_name (str): The name of the database
+        
+        Returns:
+        list[dict]: One entry per query with keys query, collection, stages, indexes and collscan
+        """
+        db = self.__clinet[db_name]
+        plans = []
+        for name, collection_name, filter_field in self.PIPELINE_QUERIES:
+            winning_plan = db[collection_name].find(filter_field).explain()["queryPlanner"]["winningPlan"]
+            stages = list(self.__plan_stages(winning_plan))
+            plans.append({
+                "query": name,
+                "collection": collection_name,
+                "stages": [stage["stage"] for stage in stages],
+                "indexes": [stage["indexName"] for stage in stages if "indexName" in stage],
+                "collscan": any(stage["stage"] == "COLLSCAN" for stage in stages)
+            })
+        return plans
+
+    @staticmethod
+    def __plan_stages(plan:dict):
+        # Newer servers wrap the classic plan tree in queryPlan
+        plan = plan.get("queryPlan", plan)
+        if "stage" in plan:
+            yield plan
+        children = plan.get("inputStages", [])
+        if "inputStage" in plan:
+            children = [plan["inputStage"]] + children
+        for child in children:
+            yield from MongoManager.__plan_stages(child)
 
     def fetch_collection(self, db_name:str, collection_name:str):
         db = self.__clinet[db_name]
@@ -23,52 +150,706 @@ class MongoManager:
         documents = list(cursor)
         return json.loads(json_util.dumps(documents))
 
+    def stream_collection(self, db_name:str, collection_name:str, filter_field:dict = None, projection:dict = None, batch_size:int = 1000, raw:bool = False):
+        """
+        Yields documents straight from the cursor instead of materializing the whole
+        result and round-tripping it through Extended JSON like fetch_collection does.
+        
+        ObjectId values are converted to their hex string and datetime values to ISO
+        format strings, so the documents stay JSON-serializable; nothing else is copied.
+        With raw, RawBSONDocument instances are yielded instead and fields are only
+        decoded when they are accessed.
+        
+        Parameters:
+        db_name (str): The name of the database
+        collection_name (str): The name of the collection
+        filter_field (dict): Query filter, or None for every document
+        projection (dict): Fields to return, or None for whole documents
+        batch_size (int): Number of documents fetched per round trip
+        raw (bool): Yield undecoded RawBSONDocument instances
+        
+        Yields:
+        dict: One document at a time
+        """
+        collection = self.__clinet[db_name][collection_name]
+        if raw:
+            collection = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+        
+        cursor = collection.find(filter_field or {}, projection).batch_size(batch_size)
+        if raw:
+            yield from cursor
+            return
+        for document in cursor:
+            yield self.__to_plain(document)
+
+    @staticmethod
+    def __to_plain(value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if isinstance(item, (dict, list, ObjectId, datetime)):
+                    value[key] = MongoManager.__to_plain(item)
+            return value
+        if isinstance(value, list):
+            return [MongoManager.__to_plain(item) for item in value]
+        if isinstance(value, ObjectId):
+            return str(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
     def upsert_to_collection_from_list(self, db_name:str, collection_name:str, products:list[dict]):
         db = self.__clinet[db_name]
         collection = db[collection_name]
           # Prepare bulk operations
+        current_timestamp = datetime.now()
+        history_limit = self.__embedded_history_limit(db_name, collection_name)
         operations = []
+        history_points = []
+        for product in products:
+            operation, history_entry = self.__build_upsert_operation(product, current_timestamp, history_limit)
+            operations.append(operation)
+            history_points.append(self.__history_point(product, history_entry, current_timestamp))
+        
+        # Execute all operations at once
+        if operations:
+            result = collection.bulk_write(operations)
+            self.__insert_history_points(db_name, history_points)
+            print(f"Modified: {result.modified_count}, Upserted: {result.upserted_count}")
+        else:
+            print("No operations to perform.")
+
+    def upsert_to_collection_from_stream(self, db_name:str, collection_name:str, products, chunk_size:int = 1000, change_aware:bool = False):
+        """
+        Upserts products from any iterable in unordered bulk writes of chunk_size,
+        so only one chunk of operations is held in memory at a time.
+        
+        With change_aware, products are compared against a snapshot of the collection
+        loaded once per run (see load_upsert_snapshot): a price_history entry is pushed
+        when the price differs from the last recorded one or on the first run of the day
+        (so the history keeps one point per day a product is seen), only changed fields
+        are $set, and products with no changes are not written at all.
+        
+        Parameters:
+        db_name (str): The name of the database
+        collection_name (str): The name of the collection
+        products (iterable[dict]): Products to upsert, e.g. a generator over the scraper output files
+        chunk_size (int): Number of products per bulk_write
+        change_aware (bool): Skip writes that would not change the stored document
+        
+        Yields:
+        dict: Per-chunk counts with keys chunk, products, upserted, modified and skipped
+        """
+        db = self.__clinet[db_name]
+        collection = db[collection_name]
         current_timestamp = datetime.now()
+        history_limit = self.__embedded_history_limit(db_name, collection_name)
+        snapshot = self.load_upsert_snapshot(db_name, collection_name) if change_aware else None
+        products = iter(products)
         
-        for product in products:
-            # Create a unique identifier for the product
-            # Using product_code and online_mag to uniquely identify products
-            product_identifier = {
+        chunk_number = 0
+        while True:
+            chunk = list(islice(products, chunk_size))
+            if not chunk:
+                return
+            
+            operations = []
+            history_points = []
+            for product in chunk:
+                if change_aware:
+                    operation, history_entry = self.__build_change_aware_operation(product, current_timestamp, snapshot, history_limit)
+                else:
+                    operation, history_entry = self.__build_upsert_operation(product, current_timestamp, history_limit)
+                if operation is not None:
+                    operations.append(operation)
+                if history_entry is not None:
+                    history_points.append(self.__history_point(product, history_entry, current_timestamp))
+            
+            chunk_number += 1
+            upserted = modified = 0
+            if operations:
+                result = collection.bulk_write(operations, ordered=False)
+                upserted, modified = result.upserted_count, result.modified_count
+            self.__insert_history_points(db_name, history_points)
+            self.__upsert_stats["writes"] += len(operations)
+            yield {
+                "chunk": chunk_number,
+                "products": len(chunk),
+                "upserted": upserted,
+                "modified": modified,
+                "skipped": len(chunk) - len(operations)
+            }
+
+    def load_upsert_snapshot(self, db_name:str, collection_name:str) -> dict:
+        """
+        Loads the (product_code, online_mag) -> last price, day of the last price point and
+        field digests snapshot used by
+        change-aware upserts. The snapshot is read once per run and kept up to date by the
+        upserts themselves; price_history is projected down to its last entry.
+        
+        Parameters:
+        db_name (str): The name of the database
+        collection_name (str): The name of the collection
+        
+        Returns:
+        dict: The snapshot for the collection
+        """
+        if (db_name, collection_name) in self.__snapshots:
+            return self.__snapshots[(db_name, collection_name)]
+        
+        collection = self.__clinet[db_name][collection_name]
+        snapshot = {}
+        for document in collection.find({}, {"_id": 0, "price_history": {"$slice": -1}}):
+            history = document.pop("price_history", None) or [{}]
+            key = (document.get("product_code"), document.get("online_mag"))
+            snapshot[key] = {
+                "price": history[-1].get("price"),
+                "day": self.__history_day(history[-1]),
+                "fields": {field: self.__field_digest(value) for field, value in document.items()}
+            }
+        
+        self.__snapshots[(db_name, collection_name)] = snapshot
+        return snapshot
+
+    def upsert_report(self) -> dict:
+        """
+        Returns counts of the writes issued and avoided by change-aware upserts:
+        writes, unchanged_products, history_pushes_avoided and fields_not_set.
+        """
+        return dict(self.__upsert_stats)
+
+    def __build_change_aware_operation(self, product:dict, current_timestamp:datetime, snapshot:dict, history_limit:int = None):
+        key = (product["product_code"], product["online_mag"])
+        known = snapshot.get(key)
+        digests = {
+            field: self.__field_digest(value)
+            for field, value in product.items()
+            if field not in self.__VOLATILE_FIELDS
+        }
+        
+        history_entry = self.__price_history_entry(product, current_timestamp)
+        if known is None:
+            snapshot[key] = {"price": product["price"], "day": self.__history_day(history_entry), "fields": digests}
+            return self.__build_upsert_operation(product, current_timestamp, history_limit)
+        
+        changed_fields = {field: product[field] for field, digest in digests.items() if known["fields"].get(field) != digest}
+        price_changed = known["price"] != product["price"]
+        # price_history keeps at least one point per day a product is seen, which the
+        # price drop feed relies on; later runs of the same day only push price changes
+        needs_history_point = price_changed or known.get("day") != self.__history_day(history_entry)
+        
+        if not changed_fields and not needs_history_point:
+            self.__upsert_stats["unchanged_products"] += 1
+            self.__upsert_stats["history_pushes_avoided"] += 1
+            self.__upsert_stats["fields_not_set"] += len(digests)
+            return None, None
+        
+        # Volatile fields are only refreshed alongside a real change
+        update = {"$set": dict(changed_fields, **{field: product[field] for field in self.__VOLATILE_FIELDS if field in product})}
+        if "specifications" in changed_fields:
+            update["$rename"] = self.__STALE_PREDICTION
+        self.__upsert_stats["fields_not_set"] += len(digests) - len(changed_fields)
+        
+        if needs_history_point:
+            update["$push"] = self.__price_history_push(history_entry, history_limit)
+            known["day"] = self.__history_day(history_entry)
+        else:
+            history_entry = None
+            self.__upsert_stats["history_pushes_avoided"] += 1
+        
+        known["price"] = product["price"]
+        known["fields"].update(digests)
+        return UpdateOne({"product_code": key[0], "online_mag": key[1]}, update, upsert=True), history_entry
+
+    @staticmethod
+    def __history_day(price_history_entry:dict):
+        # Timestamps are '%Y_%m_%d_%H_%M' strings, the day is their date part
+        timestamp = price_history_entry.get("timestamp")
+        return timestamp[:10] if isinstance(timestamp, str) else None
+
+    @staticmethod
+    def __field_digest(value) -> bytes:
+        return hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode('utf-8'), digest_size=8).digest()
+
+    def __build_upsert_operation(self, product:dict, current_timestamp:datetime, history_limit:int = None) -> tuple[UpdateOne, dict]:
+        # Create a unique identifier for the product
+        # Using product_code and online_mag to uniquely identify products
+        product_identifier = {
+            "product_code": product["product_code"],
+            "online_mag": product["online_mag"]
+        }
+        
+        # Create a price history entry
+        price_history_entry = self.__price_history_entry(product, current_timestamp)
+        
+        # Create an update operation
+        operation = UpdateOne(
+            # Filter criteria to find the document
+            product_identifier,
+            # Update operations
+            {
+                # Set all fields from the new product data
+                "$set": product,
+                # Add the current price to the price_history array
+                "$push": self.__price_history_push(price_history_entry, history_limit),
+                # The specifications may have changed, let the prediction stage recheck them
+                "$rename": self.__STALE_PREDICTION
+            },
+            # If the product doesn't exist, insert it with an initial price_history
+            upsert=True
+        )
+        return operation, price_history_entry
+
+    def __price_history_entry(self, product:dict, current_timestamp:datetime) -> dict:
+        return {
+            "price": product["price"],
+            "timestamp": product.get("timestamp", current_timestamp.strftime('%Y_%m_%d_%H_%M'))
+        }
+
+    @staticmethod
+    def __price_history_push(price_history_entry:dict, history_limit:int = None) -> dict:
+        # Keep only the last history_limit points embedded, the full history lives in the time-series collection
+        if history_limit:
+            return {"price_history": {"$each": [price_history_entry], "$slice": -history_limit}}
+        return {"price_history": price_history_entry}
+
+    def __embedded_history_limit(self, db_name:str, collection_name:str):
+        # Older embedded points only exist in price_history until the migration copied them
+        if self.__history_limit and self.embedded_history_migrated(db_name, collection_name):
+            return self.__history_limit
+        return None
+
+    def embedded_history_migrated(self, db_name:str, collection_name:str) -> bool:
+        """
+        Whether migrate_embedded_price_history has completed for the collection. Until it
+        has, upserts do not cap the embedded price_history arrays to history_limit, so no
+        point is trimmed before it was copied to the time-series collection.
+        
+        Parameters:
+        db_name (str): The name of the database
+        collection_name (str): The name of the products collection
+        
+        Returns:
+        bool: True once the migration's marker was written
+        """
+        if (db_name, collection_name) in self.__history_migrated:
+            return True
+        if not self.__history_collection:
+            return False
+        
+        marker = self.__clinet[db_name][self.__MIGRATIONS].find_one({"_id": f"embedded_price_history.{collection_name}"})
+        if marker is not None:
+            self.__history_migrated.add((db_name, collection_name))
+        return marker is not None
+
+    def __history_point(self, product:dict, price_history_entry:dict, current_timestamp:datetime) -> dict:
+        try:
+            recorded_at = datetime.strptime(price_history_entry.get("timestamp"), '%Y_%m_%d_%H_%M')
+        except (TypeError, ValueError):
+            recorded_at = current_timestamp
+        return {
+            "recorded_at": recorded_at,
+            "product": {
                 "product_code": product["product_code"],
                 "online_mag": product["online_mag"]
-            }
+            },
+            "price": price_history_entry["price"]
+        }
+
+    def __insert_history_points(self, db_name:str, history_points:list[dict]):
+        if not self.__history_collection or not history_points:
+            return
+        self.ensure_history_collection(db_name)
+        self.__clinet[db_name][self.__history_collection].insert_many(history_points, ordered=False)
+
+    def ensure_history_collection(self, db_name:str):
+        """
+        Creates the price history time-series collection (time field recorded_at,
+        meta field product = {product_code, online_mag}) if it does not exist yet.
+        
+        Parameters:
+        db_name (str): The name of the database
+        """
+        if not self.__history_collection or db_name in self.__history_ready:
+            return
+        
+        db = self.__clinet[db_name]
+        if self.__history_collection not in db.list_collection_names():
+            db.create_collection(
+                self.__history_collection,
+                timeseries={"timeField": "recorded_at", "metaField": "product", "granularity": "hours"}
+            )
+        db[self.__history_collection].create_index(
+            [("product.product_code", 1), ("product.online_mag", 1), ("recorded_at", 1)]
+        )
+        self.__history_ready.add(db_name)
+
+    def fetch_price_history(self, db_name:str, product_code:str, online_mag:str = None, start:datetime = None, end:datetime = None) -> list[dict]:
+        """
+        Returns the price points of a product from the time-series collection, oldest first.
+        
+        Parameters:
+        db_name (str): The name of the database
+        product_code (str): The product code
+        online_mag (str): Restrict to one retailer, or None for every retailer
+        start (datetime): Inclusive lower bound of the range, or None
+        end (datetime): Exclusive upper bound of the range, or None
+        
+        Returns:
+        list[dict]: Points with keys recorded_at, online_mag and price
+        """
+        if not self.__history_collection:
+            raise ValueError("No price history collection configured")
+        
+        filter_criteria = {"product.product_code": product_code}
+        if online_mag is not None:
+            filter_criteria["product.online_mag"] = online_mag
+        if start is not None or end is not None:
+            filter_criteria["recorded_at"] = {}
+            if start is not None:
+                filter_criteria["recorded_at"]["$gte"] = start
+            if end is not None:
+                filter_criteria["recorded_at"]["$lt"] = end
+        
+        cursor = self.__clinet[db_name][self.__history_collection].find(
+            filter_criteria, {"_id": 0, "recorded_at": 1, "product.online_mag": 1, "price": 1}
+        ).sort("recorded_at", 1)
+        return [
+            {"recorded_at": point["recorded_at"], "online_mag": point["product"]["online_mag"], "price": point["price"]}
+            for point in cursor
+        ]
+
+    def migrate_embedded_price_history(self, db_name:str, collection_name:str, batch_size:int = 500):
+        """
+        One-time migration of the embedded price_history arrays into the time-series
+        collection, trimming each array to history_limit points afterwards.
+        Embedded points whose (product, recorded_at) is already in the time-series
+        collection are skipped, so the migration can be rerun safely and does not copy
+        points that upserts already recorded there. Malformed entries (no price, or a
+        missing or unparsable timestamp) are not migrated and are counted.
+        
+        Once every product was processed a marker is written, after which upserts cap
+        the embedded arrays as well (see embedded_history_migrated).
+        
+        Parameters:
+        db_name (str): The name of the database
+        collection_name (str): The name of the products collection
+        batch_size (int): Number of products per batch of writes
+        
+        Yields:
+        dict: Per-batch counts with keys batch, products, points, skipped (points already
+            in the time-series collection) and malformed
+        """
+        if not self.__history_collection:
+            raise ValueError("No price history collection configured")
+        
+        self.ensure_history_collection(db_name)
+        db = self.__clinet[db_name]
+        collection = db[collection_name]
+        history = db[self.__history_collection]
+        migrated_at = datetime.now()
+        
+        cursor = collection.find(
+            {"price_history.0": {"$exists": True}},
+            {"product_code": 1, "online_mag": 1, "price_history": 1}
+        ).batch_size(batch_size)
+        
+        batch_number = 0
+        while True:
+            documents = list(islice(cursor, batch_size))
+            if not documents:
+                db[self.__MIGRATIONS].update_one(
+                    {"_id": f"embedded_price_history.{collection_name}"},
+                    {"$set": {"completed_at": datetime.now()}},
+                    upsert=True
+                )
+                self.__history_migrated.add((db_name, collection_name))
+                return
+            
+            history_points = []
+            trims = []
+            skipped = malformed = 0
+            for document in documents:
+                entries = document["price_history"] if isinstance(document["price_history"], list) else []
+                valid_entries = [entry for entry in entries if self.__is_migratable_entry(entry)]
+                malformed += len(entries) - len(valid_entries)
+                points = [self.__history_point(document, entry, migrated_at) for entry in valid_entries]
+                recorded = set()
+                if points:
+                    recorded = {
+                        point["recorded_at"]
+                        for point in history.find({
+                            "product.product_code": document["product_code"],
+                            "product.online_mag": document["online_mag"],
+                            "recorded_at": {"$in": [point["recorded_at"] for point in points]}
+                        }, {"_id": 0, "recorded_at": 1})
+                    }
+                
+                for point in points:
+                    if point["recorded_at"] in recorded:
+                        skipped += 1
+                    else:
+                        recorded.add(point["recorded_at"])
+                        history_points.append(point)
+                if self.__history_limit:
+                    trims.append(UpdateOne(
+                        {"_id": document["_id"]},
+                        {"$push": {"price_history": {"$each": [], "$slice": -self.__history_limit}}}
+                    ))
+            
+            if history_points:
+                history.insert_many(history_points, ordered=False)
+            if trims:
+                collection.bulk_write(trims, ordered=False)
             
-            # Create a price history entry
-            price_history_entry = {
-                "price": product["price"],
-                "timestamp": product.get("timestamp", current_timestamp.strftime('%Y_%m_%d_%H_%M'))
+            batch_number += 1
+            yield {
+                "batch": batch_number,
+                "products": len(documents),
+                "points": len(history_points),
+                "skipped": skipped,
+                "malformed": malformed
             }
+
+    @staticmethod
+    def __is_migratable_entry(entry) -> bool:
+        if not isinstance(entry, dict) or "price" not in entry:
+            return False
+        try:
+            datetime.strptime(entry.get("timestamp"), '%Y_%m_%d_%H_%M')
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    def materialize_price_drops(self, db_name:str, collection_name:str, output_collection:str, current_date:str) -> int:
+        """
+        Runs one aggregation over the products scraped on current_date that keeps those whose
+        latest price_history point, recorded on current_date, is lower than the one before it,
+        and writes them with $out to output_collection (replacing it). Each entry holds
+        product_code, online_mag, name, url, category, old_price, new_price and timestamp.
+        A drop recorded on an earlier day is therefore not reported again.
+        
+        Parameters:
+        db_name (str): The name of the database
+        collection_name (str): The name of the products collection
+        output_collection (str): The collection receiving the price drops, e.g. price_drops_<date>
+        current_date (str): Day of the run, '%Y_%m_%d' like the price_history timestamps
+        
+        Returns:
+        int: Number of price drops written
+        """
+        db = self.__clinet[db_name]
+        db[collection_name].aggregate([
+            # Prefix match on the scrape timestamp, served by the timestamp index
+            {"$match": {"timestamp": {"$regex": f"^{re.escape(current_date)}"}}},
+            {"$project": {
+                "_id": 0,
+                "product_code": 1,
+                "online_mag": 1,
+                "name": 1,
+                "url": 1,
+                "category": 1,
+                "previous": {"$arrayElemAt": ["$price_history", -2]},
+                "latest": {"$arrayElemAt": ["$price_history", -1]}
+            }},
+            {"$match": {
+                "previous.price": {"$exists": True},
+                "latest.price": {"$exists": True},
+                "$expr": {"$and": [
+                    {"$lt": ["$latest.price", "$previous.price"]},
+                    # '%Y_%m_%d_%H_%M' strings sort chronologically, so this keeps points from current_date on
+                    {"$gte": ["$latest.timestamp", current_date]}
+                ]}
+            }},
+            {"$project": {
+                "product_code": 1,
+                "online_mag": 1,
+                "name": 1,
+                "url": 1,
+                "category": 1,
+                "old_price": "$previous.price",
+                "new_price": "$latest.price",
+                "timestamp": "$latest.timestamp"
+            }},
+            {"$out": output_collection}
+        ])
+        db[output_collection].create_index([("product_code", 1)], name="product_code")
+        return db[output_collection].count_documents({})
+
+    def enqueue_notifications(self, db_name:str, notifications:list[dict], outbox_collection:str = "notification_outbox") -> dict:
+        """
+        Writes the price drops of each notification to its user's digest for the date, leaving
+        out every item that is already in the outbox (pending or sent). Items are keyed by
+        (user, product_code, online_mag, price point), so a rerun enqueues nothing new and a
+        user only gets a message when one of their watched products has a new price drop.
+        
+        Digests are keyed by (user, date): a rerun that finds new drops appends them to the
+        user's pending digest for the date. Once that digest was sent (or given up on), the
+        new drops are left out, so a user never gets more than one digest per date.
+        
+        Parameters:
+        db_name (str): The name of the database
+        notifications (list[dict]): Messages with keys user, date, subject and items, where each item
+            holds product_code, online_mag, old_price, new_price and timestamp
+        outbox_collection (str): The name of the outbox collection
+        
+        Returns:
+        dict: Counts with keys enqueued, appended, items, duplicate_items and already_sent_items
+        """
+        outbox = self.__clinet[db_name][outbox_collection]
+        # Items may be shared between users, so the keyed copies are kept apart
+        keyed_items = [
+            [dict(item, key=self.__notification_key(notification["user"], item)) for item in notification["items"]]
+            for notification in notifications
+        ]
+        
+        all_keys = [item["key"] for items in keyed_items for item in items]
+        known_keys = set()
+        for offset in range(0, len(all_keys), 1000):
+            for entry in outbox.find({"items.key": {"$in": all_keys[offset:offset + 1000]}}, {"_id": 0, "items.key": 1}):
+                known_keys.update(item["key"] for item in entry["items"])
+        
+        # Digests already in the outbox for the users and dates being enqueued
+        digests = {}
+        users = list({notification["user"] for notification in notifications})
+        dates = list({notification["date"] for notification in notifications})
+        for offset in range(0, len(users), 1000):
+            for digest in outbox.find(
+                {"user": {"$in": users[offset:offset + 1000]}, "date": {"$in": dates}},
+                {"user": 1, "date": 1, "status": 1}
+            ):
+                digests[(digest["user"], digest["date"])] = digest
+        
+        messages = []
+        appended = appended_items = already_sent_items = 0
+        for notification, items in zip(notifications, keyed_items):
+            items = [item for item in items if item["key"] not in known_keys]
+            if not items:
+                continue
             
-            # Create an update operation
-            update_operation = UpdateOne(
-                # Filter criteria to find the document
-                product_identifier,
-                # Update operations
-                {
-                    # Set all fields from the new product data
-                    "$set": product,
-                    # Add the current price to the price_history array
-                    "$push": {
-                        "price_history": price_history_entry
-                    }
-                },
-                # If the product doesn't exist, insert it with an initial price_history
-                upsert=True
-            )
+            digest = digests.get((notification["user"], notification["date"]))
+            if digest is None:
+                messages.append({
+                    "user": notification["user"],
+                    "date": notification["date"],
+                    "subject": notification["subject"],
+                    "items": items,
+                    "status": "pending",
+                    "attempts": 0,
+                    "created_at": datetime.now()
+                })
+                continue
             
-            operations.append(update_operation)
+            # Only a digest that is still pending takes new items; the filter guards against it being sent meanwhile
+            result = None
+            if digest["status"] == "pending":
+                result = outbox.update_one({"_id": digest["_id"], "status": "pending"}, {"$push": {"items": {"$each": items}}})
+            if result is not None and result.modified_count:
+                appended += 1
+                appended_items += len(items)
+            else:
+                already_sent_items += len(items)
         
-        # Execute all operations at once
-        if operations:
-            result = collection.bulk_write(operations)
-            print(f"Modified: {result.modified_count}, Upserted: {result.upserted_count}")
-        else:
-            print("No operations to perform.")
+        enqueued = len(messages)
+        if messages:
+            try:
+                outbox.insert_many(messages, ordered=False)
+            except BulkWriteError as e:
+                # A concurrent run already enqueued some of these digests or items (unique user/date and items.key)
+                enqueued = e.details["nInserted"]
+        
+        new_items = sum(len(message["items"]) for message in messages) + appended_items
+        return {
+            "enqueued": enqueued,
+            "appended": appended,
+            "items": new_items,
+            "duplicate_items": len(all_keys) - new_items - already_sent_items,
+            "already_sent_items": already_sent_items
+        }
+
+    def fetch_pending_notifications(self, db_name:str, batch_size:int = 100, after_id = None, outbox_collection:str = "notification_outbox") -> list[dict]:
+        """
+        Returns up to batch_size pending outbox messages in _id (creation) order, starting
+        after after_id so a drain pages through the outbox even when messages stay pending.
+        
+        Parameters:
+        db_name (str): The name of the database
+        batch_size (int): Maximum number of messages returned
+        after_id: _id of the last message of the previous batch, or None to start from the oldest
+        outbox_collection (str): The name of the outbox collection
+        
+        Returns:
+        list[dict]: Outbox messages
+        """
+        outbox = self.__clinet[db_name][outbox_collection]
+        filter_criteria = {"status": "pending"}
+        if after_id is not None:
+            filter_criteria["_id"] = {"$gt": after_id}
+        return list(outbox.find(filter_criteria).sort("_id", 1).limit(batch_size))
+
+    def mark_notifications(self, db_name:str, sent_ids:list, failed_ids:list, max_attempts:int = 3, outbox_collection:str = "notification_outbox"):
+        """
+        Marks outbox messages as sent, and records a failed attempt for the others.
+        A message that failed max_attempts times is marked failed and no longer retried.
+        
+        Parameters:
+        db_name (str): The name of the database
+        sent_ids (list): _id of the messages that were delivered
+        failed_ids (list): _id of the messages that could not be delivered
+        max_attempts (int): Number of attempts before a message is given up on
+        outbox_collection (str): The name of the outbox collection
+        """
+        outbox = self.__clinet[db_name][outbox_collection]
+        if sent_ids:
+            outbox.update_many(
+                {"_id": {"$in": sent_ids}},
+                {"$set": {"status": "sent", "sent_at": datetime.now()}, "$inc": {"attempts": 1}}
+            )
+        if failed_ids:
+            outbox.update_many({"_id": {"$in": failed_ids}}, {"$inc": {"attempts": 1}})
+            outbox.update_many(
+                {"_id": {"$in": failed_ids}, "attempts": {"$gte": max_attempts}},
+                {"$set": {"status": "failed"}}
+            )
+
+    @staticmethod
+    def __notification_key(user:str, item:dict) -> str:
+        return f'{user}|{item["product_code"]}|{item["online_mag"]}|{item.get("timestamp")}|{item["new_price"]}'
+
+    def update_predictions_from_stream(self, db_name:str, collection_name:str, predictions, batch_size:int = 1000) -> int:
+        """
+        Stores the prediction state of scored products: recommended_price (when the product
+        was re-scored, None when its features could not be scored), prediction_model_version
+        and prediction_feature_hash. Like
+        update_recommended_price_from_list, every product with the same product_code is updated.
+        Predictions are consumed from any iterable in unordered bulk writes of batch_size.
+        
+        Parameters:
+        db_name (str): The name of the database
+        collection_name (str): The name of the collection
+        predictions: Iterable of entries with product_code, prediction_model_version,
+            prediction_feature_hash and optionally recommended_price
+        batch_size (int): Number of updates per bulk write
+        
+        Returns:
+        int: Number of modified documents
+        """
+        collection = self.__clinet[db_name][collection_name]
+        predictions = iter(predictions)
+        modified = 0
+        while True:
+            operations = [
+                UpdateMany(
+                    {"product_code": prediction["product_code"]},
+                    {
+                        "$set": {field: value for field, value in prediction.items() if field != "product_code"},
+                        "$unset": {self.__STALE_PREDICTION["prediction_model_version"]: ""}
+                    }
+                )
+                for prediction in islice(predictions, batch_size)
+            ]
+            if not operations:
+                return modified
+            modified += collection.bulk_write(operations, ordered=False).modified_count
 
     def update_recommended_price_from_list(self, db_name:str, collection_name:str, products:list[dict]):
         """
@@ -1,30 +1,168 @@
+import time
+import queue
 import smtplib
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 class MailManager:
-    __server : smtplib.SMTP
+    """
+    SMTP sender with a small pool of lazily opened connections.
+
+    Nothing is connected at construction, so no connection sits idle (and times
+    out) while the scrapers run. A connection that fails is dropped and reopened,
+    and the message retried, up to max_retries times. Batches are sent
+    concurrently over pool_size connections, paced to messages_per_second.
+
+    Sends return one of the SENT, FAILED or DRY_RUN statuses. With dry_run nothing
+    is sent and the messages are only counted, as DRY_RUN. To deliver to
+    a local sink instead (e.g. `python -m aiosmtpd -n -l localhost:1025`), point
+    smtp_address/smtp_port at it with starttls disabled and no password.
+    """
+    SENT = 'sent'
+    FAILED = 'failed'
+    DRY_RUN = 'dry_run'
     __sender_address : str
 
-    def __init__(self, sender_address, sender_password, smtp_address, smtp_port):
+    def __init__(self, sender_address, sender_password, smtp_address, smtp_port, pool_size = 2, messages_per_second = 1, max_retries = 2, starttls = True, dry_run = False, timeout = 30):
+        self.__sender_address = sender_address
+        self.__sender_password = sender_password
+        self.__smtp_address = smtp_address
+        self.__smtp_port = smtp_port
+        self.__pool_size = max(1, pool_size)
+        self.__send_interval = 1 / messages_per_second if messages_per_second > 0 else 0
+        self.__max_retries = max_retries
+        self.__starttls = starttls
+        self.__dry_run = dry_run
+        self.__timeout = timeout
+
+        # One slot per pooled connection, None until the slot is first used
+        self.__connections = queue.Queue()
+        for _ in range(self.__pool_size):
+            self.__connections.put(None)
+
+        self.__pace_lock = threading.Lock()
+        self.__next_send = 0
+        self.__stats_lock = threading.Lock()
+        self.__stats = Counter()
+
+    def send_email_to_address(self, mail_subject:str, mail_body:str, recipient_address:str) -> str:
+        message = self.__build_message(mail_subject, mail_body, recipient_address)
+        if self.__dry_run:
+            self.__count(self.DRY_RUN)
+            return self.DRY_RUN
+
+        connection = self.__connections.get()
         try:
-            self.__sender_address = sender_address
+            for attempt in range(self.__max_retries + 1):
+                try:
+                    if connection is None:
+                        connection = self.__connect()
+                    self.__pace()
+                    connection.sendmail(self.__sender_address, recipient_address, message)
+                    self.__count(self.SENT)
+                    return self.SENT
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError, smtplib.SMTPAuthenticationError) as e:
+                    # Rejected by the server, retrying would not help
+                    print(e)
+                    break
+                except OSError as e:
+                    # Dead connection (SMTPException is an OSError too): drop it and retry on a fresh one
+                    print(f"SMTP connection failed ({e}), attempt {attempt + 1}/{self.__max_retries + 1}")
+                    self.__close_connection(connection)
+                    connection = None
+                    self.__count('reconnects')
+            self.__count(self.FAILED)
+            return self.FAILED
+        finally:
+            self.__connections.put(connection)
+
+    def send_emails(self, messages:list[tuple[str, str, str]]) -> dict:
+        """
+        Send a batch of messages concurrently over the connection pool.
+
+        Args:
+            messages: (subject, body, recipient_address) tuples
+
+        Returns:
+            Report with sent, failed, dry_run, elapsed_s and messages_per_second for this
+            batch, and results, the delivery status of every message in order
+        """
+        began = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.__pool_size) as executor:
+            results = list(executor.map(self.__send_batch_message, messages))
+        elapsed = time.monotonic() - began
+
+        sent = results.count(self.SENT)
+        return {
+            'sent': sent,
+            'failed': results.count(self.FAILED),
+            'dry_run': results.count(self.DRY_RUN),
+            'elapsed_s': round(elapsed, 2),
+            'messages_per_second': round(sent / elapsed, 2) if elapsed > 0 else 0.0,
+            'results': results,
+        }
 
-            self.__server = smtplib.SMTP(smtp_address, smtp_port)
-            self.__server.starttls()
-            self.__server.login(sender_address, sender_password)
+    def __send_batch_message(self, message:tuple[str, str, str]) -> str:
+        # Any error is confined to its own message, so the outcome of the rest of the batch is kept
+        try:
+            return self.send_email_to_address(*message)
         except Exception as e:
-            print(e)
+            print(f"Could not send email to {message[2]}: {e}")
+            self.__count(self.FAILED)
+            return self.FAILED
+
+    def report(self) -> dict:
+        with self.__stats_lock:
+            return dict(self.__stats)
+
+    def close(self):
+        for _ in range(self.__pool_size):
+            self.__close_connection(self.__connections.get())
+        for _ in range(self.__pool_size):
+            self.__connections.put(None)
 
-    def send_email_to_address(self, mail_subject:str, mail_body:str, recipient_address:str):
+    def __build_message(self, mail_subject:str, mail_body:str, recipient_address:str) -> str:
         message = MIMEMultipart()
         message['From'] = self.__sender_address
         message['To'] = recipient_address
         message['Subject'] = mail_subject
         message.attach(MIMEText(mail_body, 'plain'))
-        try: 
-            text = message.as_string()
-            self.__server.sendmail(self.__sender_address, recipient_address, text)
-        
-        except Exception as e:
-            print(e)
\ No newline at end of file
+        return message.as_string()
+
+    def __connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.__smtp_address, self.__smtp_port, timeout=self.__timeout)
+        try:
+            if self.__starttls:
+                connection.starttls()
+            if self.__sender_password:
+                connection.login(self.__sender_address, self.__sender_password)
+        except Exception:
+            self.__close_connection(connection)
+            raise
+        self.__count('connections')
+        return connection
+
+    def __close_connection(self, connection):
+        if connection is None:
+            return
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    def __pace(self):
+        if not self.__send_interval:
+            return
+        with self.__pace_lock:
+            now = time.monotonic()
+            send_at = max(now, self.__next_send)
+            self.__next_send = send_at + self.__send_interval
+        if send_at > now:
+            time.sleep(send_at - now)
+
+    def __count(self, key:str):
+        with self.__stats_lock:
+            self.__stats[key] += 1
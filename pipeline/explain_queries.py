@@ -0,0 +1,32 @@
+from database_manager.database_manager import MongoManager
+from configparser import ConfigParser
+import sys
+
+config = ConfigParser()
+config.read('cfg-secret.ini')
+
+def main():
+    """
+    Print the winning plan of every query the pipeline issues and flag collection scans.
+    Pass --ensure to create the declared indexes first.
+    """
+    db_manager = MongoManager(config['Mongo']['connection_string'])
+
+    if '--ensure' in sys.argv[1:]:
+        ensured_indexes, failed_indexes = db_manager.ensure_indexes('app')
+        print(f"Ensured indexes: {', '.join(ensured_indexes)}")
+        for index_name, error in failed_indexes.items():
+            print(f"Could not create index {index_name}: {error}")
+
+    plans = db_manager.explain_queries('app')
+    for plan in plans:
+        flag = 'COLLSCAN' if plan['collscan'] else 'ok'
+        indexes = ', '.join(plan['indexes']) or '-'
+        print(f"[{flag:>8}] {plan['query']} on {plan['collection']}: {' <- '.join(plan['stages'])} (indexes: {indexes})")
+
+    collscans = sum(plan['collscan'] for plan in plans)
+    print(f"{collscans} of {len(plans)} queries do a collection scan")
+    return 1 if collscans else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
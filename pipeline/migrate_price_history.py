@@ -0,0 +1,39 @@
+from database_manager.database_manager import MongoManager
+from configparser import ConfigParser
+
+config = ConfigParser()
+config.read('cfg-secret.ini')
+config_util = ConfigParser()
+config_util.read('cfg.ini')
+
+def main():
+    """
+    Copy the embedded price_history of every product into the time-series
+    history collection and cap the embedded arrays to [History] embedded_limit.
+    Safe to rerun: points already in the history collection are not copied again.
+    Upserts only start capping the embedded arrays once this has completed.
+    """
+    db_manager = MongoManager(
+        config['Mongo']['connection_string'],
+        history_collection=config_util['History']['collection'],
+        history_limit=config_util['History'].getint('embedded_limit', fallback=None)
+    )
+
+    total_products = total_points = total_skipped = total_malformed = 0
+    for batch in db_manager.migrate_embedded_price_history('app', 'products'):
+        total_products += batch['products']
+        total_points += batch['points']
+        total_skipped += batch['skipped']
+        total_malformed += batch['malformed']
+        print(
+            f"Batch {batch['batch']}: {batch['products']} products, {batch['points']} points, "
+            f"{batch['skipped']} points already migrated, {batch['malformed']} malformed entries skipped"
+        )
+
+    print(
+        f"Migrated {total_points} price points from {total_products} products "
+        f"({total_skipped} points already migrated, {total_malformed} malformed entries skipped)"
+    )
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,20 @@ from email_manager.mail_manager import MailManager
 from utils.os_utils import OsUtils
 from utils.logger import get_logger
 
-from regression_manager.regression_manager import RegressionManager
-from regression_manager.dataset_cleanup_manager import DatasetCleanupManager
+from regression_manager.model_registry import ModelRegistry, predict_category_in_worker
 
 from configparser import ConfigParser
 from datetime import datetime
 
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from collections import Counter
+from itertools import islice
+
 import os
 import json
+import time
+import threading
+import multiprocessing
 
 current_date = datetime.now().strftime('%Y_%m_%d')
 
@@ -27,111 +33,343 @@ logger = get_logger(
     backup_count=7
 )
 
+def scraper_output_paths(global_cfg, current_date):
+    vexio_output = f"{global_cfg['Paths']['vexio_output']}/vexio_{current_date}.jsonl"
+    evomag_output = f"{global_cfg['Paths']['evomag_output']}/evomag_{current_date}.jsonl"
+    return [vexio_output, evomag_output]
+
+def scraper_tree_paths(global_cfg):
+    return [
+        global_cfg['Paths']['vexio_output'] + 'vexio_tree.txt',
+        global_cfg['Paths']['evomag_output'] + 'evomag_tree.txt'
+    ]
+
 def scrape(scraper_manager, global_cfg, current_date):
     logger.info(f"Starting scraping process with timeout: {global_cfg['Scrapers']['timeout']} seconds")
     try:
-        scraper_manager.scrape_for_interval(int(global_cfg['Scrapers']['timeout']))
-        
-        vexio_output = f"{global_cfg['Paths']['vexio_output']}/vexio_{current_date}.json"
-        evomag_output = f"{global_cfg['Paths']['evomag_output']}/evomag_{current_date}.json"
+        scraper_report = scraper_manager.scrape_for_interval(int(global_cfg['Scrapers']['timeout']))
+        for run in scraper_report:
+            logger.info(
+                f"Scraper {run['scraper']} (shard {run['shard']}) finished with exit code {run['exit_code']} "
+                f"after {run['wall_time_s']} seconds ({run['restarts']} restarts, "
+                f"timed out: {run['timed_out']}) -- {run['product_count']} products"
+            )
         
-        logger.info(f"Scraping completed. Output files: {vexio_output}, {evomag_output}")
+        output_paths = scraper_output_paths(global_cfg, current_date)
+        logger.info(f"Scraping completed. Output files: {', '.join(output_paths)}")
         
-        scraped_data = OsUtils.readFromJsonFile([vexio_output, evomag_output])
-        logger.info(f"Retrieved {len(scraped_data)} products from scrapers")
-        
-        return scraped_data
+        return scraper_report
     except Exception as e:
         logger.exception(f"Error during scraping process: {str(e)}")
         return []
 
-def upsert(database_manager, db_name, collection_name, scraped_products):
-    logger.info(f"Upserting {len(scraped_products)} products to {db_name}.{collection_name}")
+def ingest(database_manager, db_name, collection_name, scraped_products, chunk_size, change_aware=False):
+    logger.info(f"Streaming products to {db_name}.{collection_name} in chunks of {chunk_size} (change aware: {change_aware})")
+    total_products = 0
     try:
-        database_manager.upsert_to_collection_from_list(db_name, collection_name, scraped_products)
-        logger.info("Database upsert completed successfully")
+        for chunk in database_manager.upsert_to_collection_from_stream(db_name, collection_name, scraped_products, chunk_size, change_aware):
+            total_products += chunk['products']
+            logger.info(
+                f"Chunk {chunk['chunk']}: {chunk['products']} products -- "
+                f"upserted: {chunk['upserted']}, modified: {chunk['modified']}, skipped: {chunk['skipped']}"
+            )
+        logger.info(f"Database upsert completed successfully -- {total_products} products")
+        if change_aware:
+            logger.info(f"Change-aware upsert report: {database_manager.upsert_report()}")
     except Exception as e:
         logger.exception(f"Error during database upsert: {str(e)}")
+    return total_products
+
+def scrape_and_ingest(scraper_manager, database_manager, global_cfg, current_date):
+    """
+    Run the scrapers and stream their output into the database.
+
+    In tail mode the output files are ingested while the scrapers are still
+    writing them; otherwise ingestion starts once every scraper has exited.
+    """
+    output_paths = scraper_output_paths(global_cfg, current_date)
+    chunk_size = global_cfg['Ingest'].getint('chunk_size', fallback=1000)
+    change_aware = global_cfg['Ingest'].getboolean('change_aware', fallback=False)
 
-def check_products(user_product_list, database_manager, database, collection):
+    if not global_cfg['Ingest'].getboolean('tail', fallback=False):
+        scraper_report = scrape(scraper_manager, global_cfg, current_date)
+        ingest(database_manager, 'app', 'products', OsUtils.streamFromJsonFile(output_paths), chunk_size, change_aware)
+        return scraper_report
+
+    logger.info("Tail mode enabled -- ingesting while the scrapers are running")
+    scraper_report = []
+    scraper_thread = threading.Thread(
+        target=lambda: scraper_report.extend(scrape(scraper_manager, global_cfg, current_date))
+    )
+    scraper_thread.start()
+
+    scraped_products = OsUtils.tailJsonFile(
+        output_paths,
+        lambda: not scraper_thread.is_alive(),
+        global_cfg['Ingest'].getfloat('poll_interval', fallback=5)
+    )
+    ingest(database_manager, 'app', 'products', scraped_products, chunk_size, change_aware)
+    scraper_thread.join()
+    return scraper_report
+
+def watched_product_codes(userList):
+    return {
+        product['product_code']
+        for user in userList
+        for product in user['savedProducts']
+        if product['email_notification'] == True
+    }
+
+def materialize_price_drops(database_manager, database, collection, current_date):
+    price_drop_collection = f'price_drops_{current_date}'
+    logger.info(f"Materializing price drops into {database}.{price_drop_collection}")
+    try:
+        price_drop_count = database_manager.materialize_price_drops(database, collection, price_drop_collection, current_date)
+        logger.info(f"Found {price_drop_count} products with price drops")
+    except Exception as e:
+        logger.exception(f"Error while materializing price drops: {str(e)}")
+    return price_drop_collection
+
+def fetch_watched_price_drops(database_manager, database, price_drop_collection, product_codes, chunk_size=1000):
+    """
+    Fetch the price drops of every watched product from the price drop feed with
+    $in queries of up to chunk_size codes.
+
+    Returns:
+        Map of product_code to its price drops and the number of queries issued
+    """
+    drops_by_code = {}
+    product_codes = sorted(product_codes)
+    query_count = 0
+    for offset in range(0, len(product_codes), chunk_size):
+        query_count += 1
+        for price_drop in database_manager.stream_collection(
+            database,
+            price_drop_collection,
+            {'product_code': {'$in': product_codes[offset:offset + chunk_size]}},
+            {'_id': 0, 'product_code': 1, 'online_mag': 1, 'old_price': 1, 'new_price': 1, 'timestamp': 1}
+        ):
+            drops_by_code.setdefault(price_drop['product_code'], []).append(price_drop)
+    return drops_by_code, query_count
+
+def check_products(user_product_list, drops_by_code):
     logger.info(f"Checking price changes for {len(user_product_list)} user products")
-    body = ''
-    price_change_count = 0
+    price_drops = []
     
     try:
         for product in user_product_list:
             if product['email_notification'] == True:
                 logger.debug(f"Checking product with code: {product['product_code']}")
-                matching_product_list = database_manager.fetch_collection_filtered(
-                    database, collection, {'product_code': product['product_code']}
-                )
-                
-                for matching_product in matching_product_list:
-                    # Check if price_history exists and has at least two entries
-                    if ('price_history' in matching_product and 
-                        len(matching_product['price_history']) >= 2 and
-                        'price' in matching_product['price_history'][-1] and
-                        'price' in matching_product['price_history'][-2]):
-                        
-                        old_price = matching_product['price_history'][-2]['price']
-                        new_price = matching_product['price_history'][-1]['price']
-                        
-                        if new_price < old_price:
-                            price_change_count += 1
-                            logger.info(
-                                f"Price drop detected for product {matching_product['product_code']} "
-                                f"from {old_price} to {new_price}"
-                            )
-                            body += f'Noi ofete la produsul ${matching_product["product_code"]} de la magazinul {matching_product["online_mag"]}!\n'
-                            body += f'Produsul a ajuns de la pretul de {old_price} la pretul de {new_price}!\n'
-                            body += '\n'
+                # The feed only holds products whose latest price dropped
+                for price_drop in drops_by_code.get(product['product_code'], []):
+                    logger.info(
+                        f"Price drop detected for product {price_drop['product_code']} "
+                        f"from {price_drop['old_price']} to {price_drop['new_price']}"
+                    )
+                    price_drops.append(price_drop)
         
-        logger.info(f"Found {price_change_count} products with price drops")
-        return body
+        logger.info(f"Found {len(price_drops)} products with price drops")
+        return price_drops
     except Exception as e:
         logger.exception(f"Error while checking product prices: {str(e)}")
-        return ""
+        return []
 
-def notify_users_by_mail(mail_manager, database_manager, userList, database, collection):
-    logger.info(f"Starting email notification process for {len(userList)} users")
-    notifications_sent = 0
-    
+def format_digest(price_drops):
+    body = ''
+    for price_drop in price_drops:
+        body += f'Noi ofete la produsul ${price_drop["product_code"]} de la magazinul {price_drop["online_mag"]}!\n'
+        body += f'Produsul a ajuns de la pretul de {price_drop["old_price"]} la pretul de {price_drop["new_price"]}!\n'
+        body += '\n'
+    return body
+
+def enqueue_notifications(database_manager, userList, database, price_drop_collection, current_date):
+    """
+    Write one pending outbox message per user with new price drops. Price drops that
+    are already in the outbox are left out, so reruns enqueue nothing new.
+    """
+    logger.info(f"Building notifications for {len(userList)} users")
     try:
+        watched_count = sum(
+            1 for user in userList for product in user['savedProducts'] if product['email_notification'] == True
+        )
+        product_codes = watched_product_codes(userList)
+        drops_by_code, query_count = fetch_watched_price_drops(database_manager, database, price_drop_collection, product_codes)
+        logger.info(
+            f"Fetched price drops for {len(product_codes)} watched products in {query_count} queries "
+            f"(previously {watched_count} queries, one per watched product per user)"
+        )
+
+        notifications = []
         for user in userList:
             logger.debug(f"Processing notifications for user: {user['email']}")
-            mail_body = check_products(user['savedProducts'], database_manager, database, collection)
-            
-            if len(mail_body) > 0:
-                logger.info(f"Sending price drop notification to {user['email']}")
-                mail_manager.send_email_to_address(
-                    'Update pentru produsele tale favorite', 
-                    mail_body, 
-                    user['email']
-                )
-                notifications_sent += 1
+            price_drops = check_products(user['savedProducts'], drops_by_code)
+            if price_drops:
+                notifications.append({
+                    'user': user['email'],
+                    'date': current_date,
+                    'subject': 'Update pentru produsele tale favorite',
+                    'items': price_drops
+                })
+
+        outbox_report = database_manager.enqueue_notifications(database, notifications)
+        logger.info(
+            f"Enqueued {outbox_report['enqueued']} notifications and added to {outbox_report['appended']} pending ones, "
+            f"with {outbox_report['items']} price drops ({outbox_report['duplicate_items']} price drops were already notified, "
+            f"{outbox_report['already_sent_items']} came after the day's digest was sent)"
+        )
+    except Exception as e:
+        logger.exception(f"Error while enqueueing notifications: {str(e)}")
+
+def notify_users_by_mail(mail_manager, database_manager, database, batch_size=100, max_attempts=3):
+    """
+    Drain the notification outbox: send pending messages in batches and mark them
+    sent, or record the failed attempt so a later run retries them. In dry run the
+    messages are left pending.
+    """
+    logger.info("Starting email notification process")
+    notifications_sent = 0
+    notifications_failed = 0
+    notifications_dry_run = 0
+    
+    try:
+        last_id = None
+        while True:
+            pending = database_manager.fetch_pending_notifications(database, batch_size, last_id)
+            if not pending:
+                break
+            last_id = pending[-1]['_id']
+
+            messages = [(message['subject'], format_digest(message['items']), message['user']) for message in pending]
+            delivery_report = mail_manager.send_emails(messages)
+            statuses = list(zip(pending, delivery_report['results']))
+            sent_ids = [message['_id'] for message, status in statuses if status == MailManager.SENT]
+            failed_ids = [message['_id'] for message, status in statuses if status == MailManager.FAILED]
+            database_manager.mark_notifications(database, sent_ids, failed_ids, max_attempts)
+
+            notifications_sent += delivery_report['sent']
+            notifications_failed += delivery_report['failed']
+            notifications_dry_run += delivery_report['dry_run']
+            logger.info(
+                f"Sent {delivery_report['sent']} of {len(pending)} notifications "
+                f"at {delivery_report['messages_per_second']} messages/s"
+            )
         
-        logger.info(f"Email notification process completed. Sent {notifications_sent} notifications")
+        logger.info(
+            f"Email notification process completed. Sent {notifications_sent} notifications, "
+            f"{notifications_failed} failed attempts, {notifications_dry_run} left pending by dry run -- {mail_manager.report()}"
+        )
     except Exception as e:
         logger.exception(f"Error during email notification process: {str(e)}")
 
-def predict_target_product_prices(db_manager:MongoManager, reg_manager:RegressionManager, cleanup_manager:DatasetCleanupManager, database:str, collection:str, target_category:str):
-    logger.info(f"Using regression model to predict prices of products of type: {target_category}")
-    filter_criteria = {
-        "predicted_price": {"$exists": False},
-        "category": target_category,
-        "online_mag": "evomag"
-    }
+def registered_category_chunks(db_manager:MongoManager, model_registry:ModelRegistry, database:str, collection:str, chunk_size:int):
+    """
+    Yields (category, model_version, products) for every category in the model registry,
+    streaming the products that need a prediction from the database in chunks of chunk_size.
 
-    fetched_products = db_manager.fetch_collection_filtered(database, collection, filter_criteria)
+    Only products whose stored prediction was not made by the current model version
+    are fetched (ingestion moves the version aside when the specifications change).
+    """
+    for category in model_registry.categories():
+        entry = model_registry.entry(category)
+        model_version = model_registry.model_version(category)
+        filter_criteria = {
+            "prediction_model_version": {"$ne": model_version},
+            "category": category
+        }
+        if entry.get('online_mag'):
+            filter_criteria["online_mag"] = entry['online_mag']
 
-    clean_products = cleanup_manager.clean_dataset(fetched_products)
+        # Only the product code, the stored prediction state and the specification keys the features are built from
+        projection = {
+            "_id": 0,
+            "product_code": 1,
+            "prediction_model_version": 1,
+            "prediction_stale_model_version": 1,
+            "prediction_feature_hash": 1,
+            **model_registry.get_cleanup_manager(category).feature_projection()
+        }
+        logger.info(f"Using regression model {model_version} to predict prices of new or changed products of type: {category}")
+        products = db_manager.stream_collection(database, collection, filter_criteria, projection)
+        while True:
+            chunk = list(islice(products, chunk_size))
+            if not chunk:
+                break
+            yield category, model_version, chunk
 
-    predicted_prices, final_products = reg_manager.predict_price(clean_products, fetched_products) 
 
-    logger.info(f"Successfully predicted prices of products of type: {target_category}")
+def predict_registered_categories(db_manager:MongoManager, model_registry:ModelRegistry, registry_path:str, database:str, collection:str, workers:int, n_jobs:int = 1, chunk_size:int = 5000):
+    """
+    Predict prices for every category in the model registry.
 
+    Product chunks from registered_category_chunks are scored in a process pool
+    (n_jobs prediction threads per worker), with at most two chunks per worker in
+    flight, and the predictions are streamed into the database writer as the chunks
+    finish. Neither the catalogue nor its predictions are held in memory whole.
+    Products whose feature hash is unchanged are not scored again; the hash is computed
+    per product (DatasetCleanupManager.feature_hashes), so it does not depend on how the
+    products are chunked.
 
-    return final_products   
+    Returns:
+        Per-category reports with rows, scored, skipped, unscored (features that are not
+        numbers), worker_s (summed worker time), elapsed_s and rows_per_second (wall time
+        of the whole stage)
+    """
+    reports = {}
+    began = time.perf_counter()
+
+    def predicted_chunks(executor):
+        chunks = registered_category_chunks(db_manager, model_registry, database, collection, chunk_size)
+        pending = {}
+        while True:
+            for category, model_version, products in islice(chunks, max(0, 2 * workers - len(pending))):
+                pending[executor.submit(predict_category_in_worker, registry_path, category, products, model_version, n_jobs)] = category
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                category = pending.pop(future)
+                try:
+                    prediction_updates, report = future.result()
+                except Exception as e:
+                    logger.exception(f"Error while predicting prices of products of type {category}: {str(e)}")
+                    continue
+                reports.setdefault(category, Counter()).update({
+                    'rows': report['rows'],
+                    'scored': report['scored'],
+                    'skipped': report['skipped'],
+                    'unscored': report['unscored'],
+                    'worker_s': report['elapsed_s'],
+                })
+                yield from prediction_updates
+
+    mp_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+        modified = db_manager.update_predictions_from_stream(database, collection, predicted_chunks(executor))
+    elapsed = time.perf_counter() - began
+
+    category_reports = []
+    for category, counts in reports.items():
+        report = {
+            'category': category,
+            'rows': counts['rows'],
+            'scored': counts['scored'],
+            'skipped': counts['skipped'],
+            'unscored': counts['unscored'],
+            'worker_s': round(counts['worker_s'], 2),
+            'elapsed_s': round(elapsed, 2),
+            'rows_per_second': round(counts['rows'] / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        logger.info(
+            f"Successfully predicted prices of products of type: {category} -- scored {report['scored']}, "
+            f"unchanged {report['skipped']}, {report['worker_s']} worker seconds ({report['rows_per_second']} rows/s)"
+        )
+        if report['unscored']:
+            logger.warning(f"{category}: {report['unscored']} products have features that are not numbers and were not scored")
+        category_reports.append(report)
+    logger.info(f"Prediction stage updated {modified} products in {elapsed:.2f} seconds")
+
+    return category_reports
 
 
 def main():
@@ -156,53 +394,85 @@ def main():
         logger.info("Initializing managers")
 
         logger.info("Initializing Scraper manager")
-        scraper_manager = ScraperManager([
-            global_cfg['Paths']['vexio_scraper'],
-            global_cfg['Paths']['evomag_scraper']
-        ])
+        scraper_manager = ScraperManager(
+            [
+                global_cfg['Paths']['vexio_scraper'],
+                global_cfg['Paths']['evomag_scraper']
+            ],
+            scraper_output_paths(global_cfg, current_date),
+            scraper_tree_paths(global_cfg),
+            [
+                int(global_cfg['Scrapers'].get('vexio_shards', 1)),
+                int(global_cfg['Scrapers'].get('evomag_shards', 1))
+            ],
+            max_restarts=int(global_cfg['Scrapers'].get('max_restarts', 2)),
+            kill_grace=int(global_cfg['Scrapers'].get('kill_grace', 60))
+        )
         
         logger.info("Initializing MongoDB manager")
-        database_manager = MongoManager(env_cfg['Mongo']['connection_string'])
+        database_manager = MongoManager(
+            env_cfg['Mongo']['connection_string'],
+            history_collection=global_cfg['History'].get('collection', fallback=None),
+            history_limit=global_cfg['History'].getint('embedded_limit', fallback=None)
+        )
         logger.info("Successfully connected to MongoDB")
+        if global_cfg['History'].get('embedded_limit', fallback=None) and not database_manager.embedded_history_migrated('app', 'products'):
+            logger.warning("Embedded price_history is not capped until pipeline/migrate_price_history.py has run")
+        # Raises when a unique index is missing: upserts and notification dedup depend on them
+        ensured_indexes, failed_indexes = database_manager.ensure_indexes('app')
+        logger.info(f"Ensured indexes: {', '.join(ensured_indexes)}")
+        for index_name, error in failed_indexes.items():
+            logger.warning(f"Could not create index {index_name}, its queries will fall back to collection scans: {error}")
 
-        logger.info("Initializing Regression managers")
-        regression_manager = RegressionManager(global_cfg['Regression']['model_path'])
-        cleanup_manager = DatasetCleanupManager()
-        logger.info("Successfully initialized regression managers")
+        logger.info("Initializing model registry")
+        registry_path = global_cfg['Regression']['registry_path']
+        model_registry = ModelRegistry(registry_path)
+        logger.info(f"Model registry holds categories: {', '.join(model_registry.categories())}")
             
-        logger.info("Initializing MailManager manager... This might take a while....")
+        logger.info("Initializing MailManager manager")
         mail_manager = MailManager(
             env_cfg['Email']['address'],
-            env_cfg['Email']['password'], 
-            'smtp.gmail.com', 
-            587
+            env_cfg['Email'].get('password', fallback=None),
+            global_cfg['Email'].get('smtp_address', fallback='smtp.gmail.com'),
+            global_cfg['Email'].getint('smtp_port', fallback=587),
+            pool_size=global_cfg['Email'].getint('pool_size', fallback=2),
+            messages_per_second=global_cfg['Email'].getfloat('messages_per_second', fallback=1),
+            max_retries=global_cfg['Email'].getint('max_retries', fallback=2),
+            starttls=global_cfg['Email'].getboolean('starttls', fallback=True),
+            dry_run=global_cfg['Email'].getboolean('dry_run', fallback=False)
         )
-        logger.info("Email manager initialized")
+        logger.info("Email manager initialized, connections open on first send")
  
         # Scrape data and update database
         logger.info("Starting scraping and database update process")
-        scraped_products = scrape(scraper_manager, global_cfg, current_date)
+        scraper_report = scrape_and_ingest(scraper_manager, database_manager, global_cfg, current_date)
+        failed_scrapers = [run['scraper'] for run in scraper_report if run['exit_code'] != 0 and not run['timed_out']]
+        if failed_scrapers:
+            logger.warning(f"Scrapers that did not finish cleanly: {', '.join(failed_scrapers)}")
         
-        if scraped_products:
-            upsert(database_manager, 'app', 'products', scraped_products)
+        # Compute the price drop feed
+        price_drop_collection = materialize_price_drops(database_manager, 'app', 'products', current_date)
         
         # Notify users
         logger.info("Starting user notification process")
         users = database_manager.fetch_collection('app', 'users')
         logger.info(f"Retrieved {len(users)} users from database")
         
-        notify_users_by_mail(
-            mail_manager,
+        enqueue_notifications(database_manager, users, 'app', price_drop_collection, current_date)
+        notify_users_by_mail(mail_manager, database_manager, 'app')
+        mail_manager.close()
+
+        # Predict product prices
+        predict_registered_categories(
             database_manager,
-            users,
+            model_registry,
+            registry_path,
             'app',
-            'products'
+            'products',
+            global_cfg['Regression'].getint('prediction_workers', fallback=2),
+            global_cfg['Regression'].getint('prediction_jobs', fallback=1),
+            global_cfg['Regression'].getint('prediction_chunk_size', fallback=5000)
         )
-
-        # Predict product prices
-        predicted_products = predict_target_product_prices(database_manager, regression_manager, cleanup_manager, 'app', 'products', 'Telefoane')
-        logger.info("Updating products with the new recommended price...")
-        database_manager.update_recommended_price_from_list('app', 'products', predicted_products)
         
         execution_time = (datetime.now() - start_time).total_seconds()
         logger.info(f"=== Product overseer process completed in {execution_time:.2f} seconds ===")
@@ -1,154 +1,181 @@
+import re
+import json
+import hashlib
 import pandas as pd
 import numpy as np
-from pandas import json_normalize
+
+YES_NO = {'Da': 1, 'Nu': 0}
+# "W x H", or a lone value that is taken as the width
+RESOLUTION_PATTERN = re.compile(r'^(.*?)(?: x (.*))?$')
+
+# Model features in model column order: (output column, kind, source column in the
+# flattened specifications, argument). Kinds:
+# - yes_no: Da/Nu answers as 1/0, missing as 0
+# - number: numeric value, 0 when missing or malformed
+# - leading_number: number before the first occurrence of the argument, e.g. "8 GB" with ' '
+# - resolution: part 0 (width) or 1 (height) of a "W x H" value
+PHONE_FEATURE_SPEC = [
+    ('5G', 'yes_no', '5G', None),
+    ('4G', 'yes_no', '4G', None),
+    ('resolution width', 'resolution', 'Rezolutie maxima (px)', 0),
+    ('resolution height', 'resolution', 'Rezolutie maxima (px)', 1),
+    ('Diagonala', 'number', 'Diagonala (inch)', None),
+    ('Numar nuclee', 'leading_number', 'Numar nuclee', '('),
+    ('Memorie Flash', 'leading_number', 'Memorie Flash', ' '),
+    ('Memorie RAM', 'leading_number', 'Memorie RAM', ' '),
+    ('Incarcare Wireless', 'yes_no', 'Incarcare Wireless', None),
+    ('Capacitate Baterie', 'leading_number', 'Capacitate', ' '),
+    ('Dual SIM', 'yes_no', 'Dual SIM', None),
+]
+
+# Feature specs by name, referenced from the model registry
+FEATURE_SPECS = {
+    'phone': PHONE_FEATURE_SPEC,
+}
 
 
 class DatasetCleanupManager:
+    def __init__(self, feature_spec = PHONE_FEATURE_SPEC):
+        self.__compiled_spec = self.__compile_spec(feature_spec)
+        self.__sources = list(dict.fromkeys(source for _, _, source, _ in feature_spec))
+
+    def feature_projection(self) -> dict:
+        """
+        MongoDB projection of the specification keys the feature spec reads, so the
+        products can be fetched without the rest of the document.
+        """
+        return {f'specifications.{source}': 1 for source in self.__sources}
+
     def clean_dataset(self, raw_products):
         """
         Main method to clean the dataset.
         
         Parameters:
         -----------
-        raw_products : list of dictionaries or JSON string
-            The raw product data to be cleaned
+        raw_products : list of dictionaries, iterable of dictionaries or JSON string
+            The raw product data to be cleaned, e.g. a list or a MongoDB cursor
             
         Returns:
         --------
         pandas.DataFrame
-            A cleaned DataFrame ready for analysis
+            A cleaned DataFrame ready for analysis, one row per product in input order
         """
-        # Convert to DataFrame if input is a list of dictionaries
-        if isinstance(raw_products, list):
-            df_smartphone = pd.DataFrame(raw_products)
-        else:
-            # Assume it's a JSON string
-            df_smartphone = pd.read_json(raw_products)
+        if isinstance(raw_products, str):
+            raw_products = json.loads(raw_products)
             
-        df_smartphone_flattened = self.__flatten_json_column(df_smartphone, 'specifications')
-        df_smartphone_extracted = self.__extract_features(df_smartphone_flattened)
-        df_smartphone_cleaned = self.__clean_features(df_smartphone_extracted)
+        feature_sources = self.__extract_features(raw_products)
+        df_smartphone_cleaned = self.__clean_features(feature_sources)
         return df_smartphone_cleaned
 
-    def __clean_features(self, df_model_training):
+    @staticmethod
+    def feature_hashes(df_features: pd.DataFrame) -> list[str]:
         """
-        Clean and standardize all the extracted features
+        Hash every row of a cleaned frame on its own values, in column order.
+
+        The column dtypes of a cleaned frame depend on the whole batch (one
+        unknown answer turns a yes/no column from int to object), so numbers are
+        hashed as floats and anything else as its string. A product therefore
+        hashes the same whatever other products are cleaned with it.
         """
-        # Create a copy to avoid modifying the original
-        df_cleaned = df_model_training.copy()
-        
-        # Clean 5G field
-        df_cleaned['5G'].fillna(0, inplace=True)
-        df_cleaned['5G'].replace('Da', 1, inplace=True)
-        df_cleaned['5G'].replace('Nu', 0, inplace=True)
-
-        # Clean 4G field
-        df_cleaned['4G'].fillna(0, inplace=True)
-        df_cleaned['4G'].replace('Da', 1, inplace=True)
-        df_cleaned['4G'].replace('Nu', 0, inplace=True)
-
-        # Clean resolution fields
-        df_cleaned['resolution width'] = pd.to_numeric(df_cleaned['resolution width'], errors='coerce')
-        df_cleaned['resolution height'] = pd.to_numeric(df_cleaned['resolution height'], errors='coerce')
-        df_cleaned['resolution height'].fillna(0, inplace=True)
-        df_cleaned['resolution width'].fillna(0, inplace=True)
-
-        # Clean diagonal size
-        df_cleaned['Diagonala'] = pd.to_numeric(df_cleaned['Diagonala'], errors='coerce')
-        df_cleaned['Diagonala'].fillna(0, inplace=True)
-
-        # Clean core count
-        df_cleaned['Numar nuclee'] = df_cleaned['Numar nuclee'].str.split('(').str[0]
-        df_cleaned['Numar nuclee'] = pd.to_numeric(df_cleaned['Numar nuclee'], errors='coerce')
-        df_cleaned['Numar nuclee'].fillna(0, inplace=True)
-
-        # Clean RAM
-        df_cleaned['Memorie RAM'] = df_cleaned['Memorie RAM'].str.split(' ').str[0]
-        df_cleaned['Memorie RAM'] = pd.to_numeric(df_cleaned['Memorie RAM'], errors='coerce')
-        df_cleaned['Memorie RAM'].fillna(0, inplace=True)
-
-        # Clean flash memory
-        df_cleaned['Memorie Flash'] = df_cleaned['Memorie Flash'].str.split(' ').str[0]
-        df_cleaned['Memorie Flash'] = pd.to_numeric(df_cleaned['Memorie Flash'], errors='coerce')
-        df_cleaned['Memorie Flash'].fillna(0, inplace=True)
-
-        # Clean wireless charging
-        df_cleaned['Incarcare Wireless'].fillna(0, inplace=True)
-        df_cleaned['Incarcare Wireless'].replace('Da', 1, inplace=True)
-        df_cleaned['Incarcare Wireless'].replace('Nu', 0, inplace=True)
-
-        # Clean battery capacity
-        df_cleaned['Capacitate Baterie'] = df_cleaned['Capacitate Baterie'].str.split(' ').str[0]
-        df_cleaned['Capacitate Baterie'] = pd.to_numeric(df_cleaned['Capacitate Baterie'], errors='coerce')
-        df_cleaned['Capacitate Baterie'].fillna(0, inplace=True)
-
-        # Clean Dual SIM
-        df_cleaned['Dual SIM'].fillna(0, inplace=True)
-        df_cleaned['Dual SIM'].replace('Da', 1, inplace=True)
-        df_cleaned['Dual SIM'].replace('Nu', 0, inplace=True)
-
-        # Uncomment if you want to encode manufacturer
-        # manufacturers = df_cleaned['Manufacturer'].unique()
-        # manufacturer_mapping = {manufacturer: i for i, manufacturer in enumerate(sorted(manufacturers))}
-        # df_cleaned['Manufacturer'] = df_cleaned['Manufacturer'].map(manufacturer_mapping)
-
-        df_final = df_cleaned.drop('price', axis=1)
-        return df_final
-
-    def __extract_features(self, df_smartphone_normalised):
+        def canonical(value):
+            if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+                return float(value)
+            return str(value)
+
+        return [
+            hashlib.blake2b(repr(tuple(canonical(value) for value in row)).encode('utf-8'), digest_size=8).hexdigest()
+            for row in df_features.itertuples(index=False, name=None)
+        ]
+
+    def __extract_features(self, raw_products):
         """
-        Extract relevant features from the normalized DataFrame
+        Pull only the specification keys used by the feature spec out of the raw
+        products into one object array per key. Nothing else of the products is
+        copied, so memory scales with the number of features rather than with
+        every specification key in the catalogue.
         """
-        df_model_training = pd.DataFrame()
-        df_model_training['5G'] = df_smartphone_normalised['5G']
-        df_model_training['4G'] = df_smartphone_normalised['4G']
-
-        # Split resolution into width and height
-        df_model_training[['resolution width', 'resolution height']] = df_smartphone_normalised['Rezolutie maxima (px)'].str.split(' x ', expand=True)
-
-        df_model_training['Diagonala'] = df_smartphone_normalised['Diagonala (inch)']
-        df_model_training['Numar nuclee'] = df_smartphone_normalised['Numar nuclee']
-        df_model_training['Memorie Flash'] = df_smartphone_normalised['Memorie Flash']
-        df_model_training['Memorie RAM'] = df_smartphone_normalised['Memorie RAM']
-        df_model_training['Incarcare Wireless'] = df_smartphone_normalised['Incarcare Wireless']
-        df_model_training['Capacitate Baterie'] = df_smartphone_normalised['Capacitate'] 
-        df_model_training['Dual SIM'] = df_smartphone_normalised['Dual SIM']
-        # df_model_training['Manufacturer'] = df_smartphone_normalised['manufacturer']
-        df_model_training['price'] = df_smartphone_normalised['price']
-
-        return df_model_training
-    
-    def __flatten_json_column(self, df, json_column):
-        result_df = df.copy()
-        
-        # Check if the JSON column exists in the DataFrame
-        if json_column not in result_df.columns:
-            raise ValueError(f"Column '{json_column}' not found in DataFrame")
-        
-        try:
-            # Handle cases where some rows might have None/NaN values in the JSON column
-            mask = result_df[json_column].notna()
-            
-            if mask.any():
-                # Apply json_normalize only to rows that have valid JSON
-                normalized_df = json_normalize(result_df.loc[mask, json_column])
-                
-                # Drop the original JSON column from the result
-                result_subset = result_df.loc[mask].drop(json_column, axis=1)
-                
-                # Combine the original DataFrame (minus the JSON column) with the normalized data
-                flattened_subset = pd.concat([result_subset.reset_index(drop=True), 
-                                           normalized_df.reset_index(drop=True)], 
-                                           axis=1)
-                
-                # Merge back with rows that had None/NaN values
-                if (~mask).any():
-                    result_df = pd.concat([flattened_subset, 
-                                        result_df.loc[~mask]]).sort_index()
-                else:
-                    result_df = flattened_subset
-            
-            return result_df
-            
-        except Exception as e:
-            raise ValueError(f"Error flattening JSON column: {str(e)}")
\ No newline at end of file
+        capacity = len(raw_products) if hasattr(raw_products, '__len__') else 1024
+        sources = {source: np.full(capacity, np.nan, dtype=object) for source in self.__sources}
+
+        count = 0
+        for product in raw_products:
+            if count == capacity:
+                # Unsized input such as a cursor: grow geometrically
+                capacity *= 2
+                for source, values in sources.items():
+                    grown = np.full(capacity, np.nan, dtype=object)
+                    grown[:count] = values
+                    sources[source] = grown
+
+            specifications = product.get('specifications') or {}
+            for source, values in sources.items():
+                value = specifications.get(source)
+                if value is not None:
+                    values[count] = value
+            count += 1
+
+        return {source: values[:count] for source, values in sources.items()}
+
+    def __clean_features(self, feature_sources):
+        """
+        Build the cleaned feature columns from the extracted specification values
+        in a single pass over the compiled feature spec.
+
+        Specification values repeat heavily across products, so every source column
+        is factorized once and the cleaning runs on its distinct values only; the
+        results are then spread back to the rows with the factorization codes.
+        """
+        factorized_sources = {}
+        # Sources shared by several features (the resolution) are parsed once
+        parsed_sources = {}
+        columns = {}
+        for output, source, clean in self.__compiled_spec:
+            if source not in factorized_sources:
+                codes, uniques = pd.factorize(feature_sources[source], use_na_sentinel=False)
+                factorized_sources[source] = (codes, pd.Series(uniques, dtype=object))
+            codes, uniques = factorized_sources[source]
+            columns[output] = clean(uniques, parsed_sources).to_numpy()[codes]
+        return pd.DataFrame(columns)
+
+    def __compile_spec(self, feature_spec):
+        """
+        Turn each (output column, kind, source column, argument) entry of the
+        feature spec into a cleaning function over the distinct source values
+        """
+        compiled = []
+        for output, kind, source, argument in feature_spec:
+            if kind == 'yes_no':
+                clean = lambda values, parsed: self.__clean_yes_no(values)
+            elif kind == 'number':
+                clean = lambda values, parsed: self.__to_number(values)
+            elif kind == 'leading_number':
+                pattern = re.compile(f'^([^{re.escape(argument)}]*)')
+                clean = lambda values, parsed, pattern=pattern: self.__to_number(values.str.extract(pattern, expand=True)[0])
+            elif kind == 'resolution':
+                clean = lambda values, parsed, source=source, part=argument: self.__to_number(
+                    self.__parse_resolution(values, source, parsed)[part]
+                )
+            else:
+                raise ValueError(f"Unknown feature kind '{kind}' for column '{output}'")
+            compiled.append((output, source, clean))
+        return compiled
+
+    @staticmethod
+    def __parse_resolution(values, source, parsed):
+        if source not in parsed:
+            parsed[source] = values.str.extract(RESOLUTION_PATTERN, expand=True)
+        return parsed[source]
+
+    @staticmethod
+    def __to_number(values):
+        # Non-string values extract to NaN and end up as 0, like the .str.split() they replace
+        return pd.to_numeric(values, errors='coerce').fillna(0)
+
+    @staticmethod
+    def __clean_yes_no(values):
+        # Da/Nu become 1/0, missing values 0, anything else is kept as is
+        cleaned = values.to_numpy(dtype=object, copy=True)
+        cleaned[pd.isna(cleaned)] = 0
+        for answer, value in YES_NO.items():
+            cleaned[cleaned == answer] = value
+        return pd.Series(cleaned).infer_objects()
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import pickle
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+ARRAYS = ('left', 'right', 'feature', 'threshold', 'value', 'roots')
+
+class ForestArtifact:
+    """
+    Tree ensemble (random forest / extra trees regressor) stored as flat, memory-mapped
+    NumPy arrays.
+
+    An artifact is a directory with one .npy file per node attribute, the nodes of every
+    tree concatenated, plus meta.json. Loading maps the files read-only instead of
+    unpickling, so it takes milliseconds and every process that loads the same artifact
+    shares one page-cached copy. (A joblib dump loaded with mmap_mode='r' does not get
+    this: sklearn copies the tree arrays out of the map into each process's heap.)
+
+    Leaves point to themselves, so prediction walks every (tree, row) pair down one
+    level per step until all of them reach a leaf, and averages the leaf values.
+    """
+
+    def __init__(self, path:str):
+        with open(os.path.join(path, 'meta.json'), 'r') as meta_file:
+            self.__meta = json.load(meta_file)
+        if self.__meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported forest artifact format {self.__meta.get('format_version')} in {path}")
+
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAYS}
+        self.__left = arrays['left']
+        self.__right = arrays['right']
+        self.__feature = arrays['feature']
+        self.__threshold = arrays['threshold']
+        self.__value = arrays['value']
+        self.__roots = arrays['roots']
+
+    @property
+    def feature_names(self) -> list[str]:
+        return self.__meta['feature_names']
+
+    @staticmethod
+    def export(model, path:str) -> dict:
+        """
+        Write a fitted single-output sklearn forest regressor as an artifact.
+
+        Args:
+            model: Fitted estimator with estimators_ (e.g. RandomForestRegressor)
+            path: Output directory, created if missing
+
+        Returns:
+            The artifact's metadata
+        """
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("Only single-output regressors can be exported")
+
+        sizes = np.array([tree.node_count for tree in trees], dtype=np.int64)
+        roots = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        left = np.concatenate([tree.children_left.astype(np.int64) for tree in trees])
+        right = np.concatenate([tree.children_right.astype(np.int64) for tree in trees])
+        offsets = np.repeat(roots, sizes)
+
+        # Re-base children on the concatenated arrays; leaves loop to themselves
+        is_leaf = left == -1
+        own_index = np.arange(len(left), dtype=np.int64)
+        left = np.where(is_leaf, own_index, left + offsets)
+        right = np.where(is_leaf, own_index, right + offsets)
+
+        arrays = {
+            'left': left.astype(np.int32 if len(left) < 2**31 else np.int64),
+            'right': right.astype(np.int32 if len(right) < 2**31 else np.int64),
+            'feature': np.where(is_leaf, 0, np.concatenate([tree.feature for tree in trees])).astype(np.int32),
+            'threshold': np.concatenate([tree.threshold for tree in trees]).astype(np.float64),
+            'value': np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(np.float64),
+            'roots': roots.astype(np.int64),
+        }
+
+        if hasattr(model, 'feature_names_in_'):
+            feature_names = [str(name) for name in model.feature_names_in_]
+        else:
+            feature_names = [str(index) for index in range(model.n_features_in_)]
+
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'estimator': type(model).__name__,
+            'n_trees': len(trees),
+            'n_nodes': int(sizes.sum()),
+            'max_depth': int(max(tree.max_depth for tree in trees)),
+            'feature_names': feature_names,
+        }
+
+        os.makedirs(path, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(path, 'meta.json'), 'w') as meta_file:
+            json.dump(meta, meta_file, indent=2)
+        return meta
+
+    def predict(self, df_features) -> np.ndarray:
+        if isinstance(df_features, pd.DataFrame):
+            missing = [name for name in self.feature_names if name not in df_features.columns]
+            if missing:
+                raise ValueError(f"Missing feature columns: {missing}")
+            df_features = df_features[self.feature_names]
+        # sklearn compares float32 inputs against the float64 thresholds
+        features = np.asarray(df_features, dtype=np.float32)
+        if features.ndim != 2 or features.shape[1] != len(self.feature_names):
+            raise ValueError(f"Expected {len(self.feature_names)} features, got shape {features.shape}")
+
+        n_rows = features.shape[0]
+        n_trees = len(self.__roots)
+        if n_rows == 0:
+            return np.zeros(0, dtype=np.float64)
+
+        # One walker per (tree, row); finished walkers are dropped each level
+        nodes = np.repeat(np.asarray(self.__roots), n_rows)
+        rows = np.tile(np.arange(n_rows), n_trees)
+        active = np.arange(len(nodes))
+        while len(active):
+            current = nodes[active]
+            go_left = features[rows[active], self.__feature[current]] <= self.__threshold[current]
+            following = np.where(go_left, self.__left[current], self.__right[current])
+            nodes[active] = following
+            active = active[following != current]
+
+        return self.__value[nodes].reshape(n_trees, n_rows).mean(axis=0)
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python forest_artifact.py <model.pkl> <artifact_dir>")
+        sys.exit(2)
+
+    with open(sys.argv[1], 'rb') as model_file:
+        model = pickle.load(model_file)
+    meta = ForestArtifact.export(model, sys.argv[2])
+    print(f"Exported {meta['estimator']} with {meta['n_trees']} trees ({meta['n_nodes']} nodes) to {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import hashlib
+import pandas as pd
+
+from regression_manager.regression_manager import RegressionManager
+from regression_manager.dataset_cleanup_manager import DatasetCleanupManager, FEATURE_SPECS
+
+class ModelRegistry:
+    """
+    Maps a standardized category to its model artifact and feature spec.
+
+    The registry file is a JSON object keyed by category:
+        {"Telefoane": {"model_path": "random_forest_model", "feature_spec": "phone", "online_mag": "evomag"}}
+    model_path (a ForestArtifact directory or a legacy pickle, see RegressionManager)
+    is resolved relative to the registry file, falling back to <model_path>.pkl when
+    the artifact directory does not exist yet; feature_spec names an
+    entry of FEATURE_SPECS and online_mag restricts the products the model scores
+    (the retailer whose specification keys it was trained on). An optional
+    model_version names the artifact; by default it is derived from its content.
+
+    Models and cleanup managers are loaded on first use and cached.
+    """
+    __entries : dict
+
+    def __init__(self, registry_path:str):
+        with open(registry_path, 'r', encoding='utf-8') as registry_file:
+            self.__entries = json.load(registry_file)
+
+        registry_dir = os.path.dirname(os.path.abspath(registry_path))
+        for category, entry in self.__entries.items():
+            if entry.get('feature_spec') not in FEATURE_SPECS:
+                raise ValueError(f"Unknown feature spec '{entry.get('feature_spec')}' for category '{category}'")
+            entry['model_path'] = os.path.join(registry_dir, entry['model_path'])
+            # Deployments that have not converted their pickle yet keep loading it
+            if not os.path.exists(entry['model_path']) and os.path.isfile(entry['model_path'] + '.pkl'):
+                entry['model_path'] += '.pkl'
+
+        self.__models = {}
+        self.__cleanup_managers = {}
+        self.__model_versions = {}
+
+    def categories(self) -> list[str]:
+        return list(self.__entries)
+
+    def entry(self, category:str) -> dict:
+        return self.__entries[category]
+
+    def model_version(self, category:str) -> str:
+        if category not in self.__model_versions:
+            entry = self.__entries[category]
+            if entry.get('model_version'):
+                self.__model_versions[category] = str(entry['model_version'])
+            else:
+                model_path = entry['model_path']
+                if os.path.isdir(model_path):
+                    artifact_files = [os.path.join(model_path, name) for name in sorted(os.listdir(model_path))]
+                else:
+                    artifact_files = [model_path]
+                digest = hashlib.sha256()
+                for artifact_file in artifact_files:
+                    with open(artifact_file, 'rb') as model_file:
+                        for chunk in iter(lambda: model_file.read(1 << 20), b''):
+                            digest.update(chunk)
+                self.__model_versions[category] = digest.hexdigest()[:16]
+        return self.__model_versions[category]
+
+    def get_model(self, category:str) -> RegressionManager:
+        if category not in self.__models:
+            self.__models[category] = RegressionManager(self.__entries[category]['model_path'])
+        return self.__models[category]
+
+    def get_cleanup_manager(self, category:str) -> DatasetCleanupManager:
+        if category not in self.__cleanup_managers:
+            self.__cleanup_managers[category] = DatasetCleanupManager(FEATURE_SPECS[self.__entries[category]['feature_spec']])
+        return self.__cleanup_managers[category]
+
+    def predict_category(self, category:str, products:list[dict], model_version:str, n_jobs:int = 1, batch_size:int = 1000) -> tuple[list[dict], dict]:
+        """
+        Clean and score one chunk of a category's products incrementally.
+
+        Each product's cleaned feature vector is hashed on its own values
+        (DatasetCleanupManager.feature_hashes). A product whose hash matches
+        the one stored with its last prediction, made by model_version, is not scored
+        again; its prediction is only restamped with the current version. The rest are
+        scored with RegressionManager.predict_stream in batches of batch_size rows,
+        n_jobs batches at a time, and the predictions are joined back by product_code.
+
+        The cleaner keeps answers it does not know as strings (e.g. a yes/no feature
+        answered 'Optional'), which the model cannot score. Like the training set, the
+        features are converted to numbers and a product with a feature that does not
+        convert is left unscored: it is stamped with its hash and the current version
+        and its recommended_price is cleared, so it is not fetched again until its
+        specifications or the model change.
+
+        Args:
+            category: Registered category
+            products: Products holding product_code, the specification keys of the feature spec
+                and the stored prediction_feature_hash / prediction_model_version /
+                prediction_stale_model_version, if any
+            model_version: Version of the category's model
+            n_jobs: Number of batches predicted concurrently
+            batch_size: Rows per prediction batch
+
+        Returns:
+            Prediction updates for MongoManager.update_predictions_from_stream, and a report
+            with rows, scored, skipped, unscored and elapsed_s
+        """
+        began = time.perf_counter()
+        updates = {}
+        to_score = []
+        unscored = 0
+        if products:
+            clean_products = self.get_cleanup_manager(category).clean_dataset(products)
+            feature_hashes = DatasetCleanupManager.feature_hashes(clean_products)
+            numeric_products = clean_products.apply(pd.to_numeric, errors='coerce')
+            convertible = numeric_products.notna().all(axis=1).to_numpy()
+
+            for position, (product, feature_hash) in enumerate(zip(products, feature_hashes)):
+                predicted_with = product.get('prediction_model_version') or product.get('prediction_stale_model_version')
+                updates[product['product_code']] = {
+                    'product_code': product['product_code'],
+                    'prediction_model_version': model_version,
+                    'prediction_feature_hash': feature_hash,
+                }
+                if product.get('prediction_feature_hash') == feature_hash and predicted_with == model_version:
+                    continue
+                if convertible[position]:
+                    to_score.append(position)
+                else:
+                    updates[product['product_code']]['recommended_price'] = None
+                    unscored += 1
+
+            feature_batches = (
+                (
+                    [products[position]['product_code'] for position in to_score[start:start + batch_size]],
+                    numeric_products.iloc[to_score[start:start + batch_size]].astype(float)
+                )
+                for start in range(0, len(to_score), batch_size)
+            )
+            for product_code, predicted_price in self.get_model(category).predict_stream(feature_batches, n_jobs):
+                updates[product_code]['recommended_price'] = float(predicted_price)
+
+        return list(updates.values()), {
+            'category': category,
+            'rows': len(products),
+            'scored': len(to_score),
+            'skipped': len(products) - len(to_score) - unscored,
+            'unscored': unscored,
+            'elapsed_s': time.perf_counter() - began,
+        }
+
+# One registry per worker process, so models stay cached across the categories it scores
+_worker_registries = {}
+
+def predict_category_in_worker(registry_path:str, category:str, products:list[dict], model_version:str, n_jobs:int = 1) -> tuple[list[dict], dict]:
+    """Process pool entry point for ModelRegistry.predict_category."""
+    if registry_path not in _worker_registries:
+        _worker_registries[registry_path] = ModelRegistry(registry_path)
+    return _worker_registries[registry_path].predict_category(category, products, model_version, n_jobs)
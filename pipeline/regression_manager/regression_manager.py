@@ -1,16 +1,29 @@
 from sklearn.ensemble import RandomForestRegressor
+import os
 import pickle
 import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from regression_manager.forest_artifact import ForestArtifact
 
 class RegressionManager:
-    __model : RandomForestRegressor = None
+    """
+    Loads a price model and scores cleaned feature frames.
+
+    model_path is either a ForestArtifact directory, which is memory-mapped and shared
+    between the processes that load it, or a legacy pickle of the fitted estimator
+    (convert one with `python pipeline/regression_manager/forest_artifact.py`).
+    Load errors are raised.
+    """
+    __model : RandomForestRegressor | ForestArtifact = None
     
     def __init__(self, model_path):
-        try:
+        if os.path.isdir(model_path):
+            self.__model = ForestArtifact(model_path)
+        else:
             with open(model_path, 'rb') as model_file:
                 self.__model = pickle.load(model_file)
-        except Exception as e:
-            print(e)
     
     def __prepare_features(self, df_dataset: pd.DataFrame) -> pd.DataFrame:
         """
@@ -56,4 +69,28 @@ class RegressionManager:
                 if i < len(predicted_prices):
                     item_dict["recommended_price"] = predicted_prices[i]
         
-        return predicted_prices, attach_to
\ No newline at end of file
+        return predicted_prices, attach_to
+
+    def predict_stream(self, feature_chunks, n_jobs:int = 1):
+        """
+        Predicts a stream of cleaned feature chunks, up to n_jobs chunks at a time,
+        so memory is bounded by the chunks in flight rather than the whole input.
+
+        Args:
+            feature_chunks: Iterable of (keys, df_features) pairs, keys identifying the rows of df_features
+            n_jobs: Number of chunks predicted concurrently
+
+        Yields:
+            (key, predicted price) pairs, in input order
+        """
+        n_jobs = max(1, n_jobs)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            for keys, df_features in feature_chunks:
+                pending.append((keys, executor.submit(self.__model.predict, df_features)))
+                if len(pending) >= n_jobs:
+                    keys, future = pending.popleft()
+                    yield from zip(keys, future.result())
+            while pending:
+                keys, future = pending.popleft()
+                yield from zip(keys, future.result())
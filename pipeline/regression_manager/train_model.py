@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from itertools import islice
+from configparser import ConfigParser
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import KFold, RandomizedSearchCV
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database_manager.database_manager import MongoManager
+from regression_manager.dataset_cleanup_manager import DatasetCleanupManager
+from regression_manager.forest_artifact import ForestArtifact
+from regression_manager.model_registry import ModelRegistry
+from utils.logger import get_logger
+
+# Hyperparameters sampled by the search; lists are sampled uniformly
+PARAM_DISTRIBUTIONS = {
+    'n_estimators': [100, 200, 300],
+    'max_depth': [None, 10, 20, 30],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': [1.0, 0.5, 'sqrt'],
+}
+
+SCORING = {
+    'mae': 'neg_mean_absolute_error',
+    'rmse': 'neg_root_mean_squared_error',
+    'r2': 'r2',
+}
+
+def load_training_set(db_manager:MongoManager, database:str, collection:str, category:str, online_mag:str, cleanup_manager:DatasetCleanupManager, chunk_size:int = 5000) -> tuple[pd.DataFrame, np.ndarray, int]:
+    """
+    Stream the priced products of a category from the database and clean them chunk by
+    chunk, so only the cleaned feature frame is kept in memory.
+
+    The cleaner keeps answers it does not know as strings (e.g. a yes/no feature
+    answered 'Optional'), which the forest cannot be fitted on, so products with a
+    feature that does not convert to a number are dropped.
+
+    Returns:
+        Cleaned float features, the matching prices and the number of dropped products
+    """
+    filter_criteria = {"category": category, "price": {"$gt": 0}}
+    if online_mag:
+        filter_criteria["online_mag"] = online_mag
+    projection = {"_id": 0, "price": 1, **cleanup_manager.feature_projection()}
+
+    products = db_manager.stream_collection(database, collection, filter_criteria, projection, batch_size=chunk_size)
+    feature_chunks = []
+    prices = []
+    dropped = 0
+    while True:
+        chunk = list(islice(products, chunk_size))
+        if not chunk:
+            break
+        features = cleanup_manager.clean_dataset(chunk).apply(pd.to_numeric, errors='coerce')
+        convertible = features.notna().all(axis=1).to_numpy()
+        dropped += int((~convertible).sum())
+        feature_chunks.append(features[convertible].astype(float))
+        prices.extend(float(product['price']) for product, keep in zip(chunk, convertible) if keep)
+
+    if not feature_chunks:
+        return pd.DataFrame(), np.zeros(0), dropped
+    return pd.concat(feature_chunks, ignore_index=True), np.asarray(prices), dropped
+
+
+def train(features:pd.DataFrame, prices:np.ndarray, folds:int = 5, search_iterations:int = 20, search_rows:int = 20000, n_jobs:int = -1, random_state:int = 0) -> tuple[RandomForestRegressor, dict]:
+    """
+    Pick hyperparameters with a randomized search scored by k-fold cross-validation,
+    then fit the chosen forest on the whole training set.
+
+    The search runs its folds x candidates fits in parallel over n_jobs and sees at most
+    search_rows sampled rows, so its duration is bounded by search_iterations, folds
+    and search_rows rather than by the size of the catalogue.
+
+    Returns:
+        The fitted model and the metrics of the chosen parameters (cross-validated
+        mae/rmse/r2 mean and std) with the search and fit timings
+    """
+    rng = np.random.default_rng(random_state)
+    if len(features) > search_rows:
+        sample = np.sort(rng.choice(len(features), search_rows, replace=False))
+        search_features, search_prices = features.iloc[sample], prices[sample]
+    else:
+        search_features, search_prices = features, prices
+
+    search = RandomizedSearchCV(
+        RandomForestRegressor(random_state=random_state),
+        PARAM_DISTRIBUTIONS,
+        n_iter=search_iterations,
+        scoring=SCORING,
+        refit=False,
+        cv=KFold(n_splits=folds, shuffle=True, random_state=random_state),
+        n_jobs=n_jobs,
+        random_state=random_state,
+    )
+    began = time.perf_counter()
+    search.fit(search_features, search_prices)
+    search_s = time.perf_counter() - began
+
+    results = search.cv_results_
+    best = int(np.argmin(results['rank_test_mae']))
+    best_params = results['params'][best]
+
+    began = time.perf_counter()
+    model = RandomForestRegressor(random_state=random_state, n_jobs=n_jobs, **best_params)
+    model.fit(features, prices)
+    fit_s = time.perf_counter() - began
+
+    # Scores of the error metrics are negated by sklearn
+    cv = {}
+    for metric in SCORING:
+        sign = 1 if metric == 'r2' else -1
+        cv[metric] = round(float(sign * results[f'mean_test_{metric}'][best]), 4)
+        cv[f'{metric}_std'] = round(float(results[f'std_test_{metric}'][best]), 4)
+
+    return model, {
+        'params': best_params,
+        'cv': cv,
+        'rows': len(features),
+        'search_rows': len(search_features),
+        'folds': folds,
+        'candidates': len(results['params']),
+        'search_s': round(search_s, 2),
+        'fit_s': round(fit_s, 2),
+    }
+
+
+def write_version(model:RandomForestRegressor, metrics:dict, output_dir:str, version:str) -> str:
+    """
+    Write the model as a ForestArtifact under <output_dir>/<version>/model, its metrics to
+    <output_dir>/<version>/metrics.json and append them to <output_dir>/metrics.jsonl,
+    the record of every trained version.
+
+    Returns:
+        The artifact directory
+    """
+    version_dir = os.path.join(output_dir, version)
+    artifact_dir = os.path.join(version_dir, 'model')
+    ForestArtifact.export(model, artifact_dir)
+
+    with open(os.path.join(version_dir, 'metrics.json'), 'w', encoding='utf-8') as metrics_file:
+        json.dump(metrics, metrics_file, indent=2)
+    with open(os.path.join(output_dir, 'metrics.jsonl'), 'a', encoding='utf-8') as history_file:
+        history_file.write(json.dumps(metrics) + '\n')
+    return artifact_dir
+
+
+def activate_version(registry_path:str, category:str, artifact_dir:str, version:str):
+    """Point the category's registry entry at a trained artifact and name its model version."""
+    with open(registry_path, 'r', encoding='utf-8') as registry_file:
+        entries = json.load(registry_file)
+
+    registry_dir = os.path.dirname(os.path.abspath(registry_path))
+    entries[category]['model_path'] = os.path.relpath(os.path.abspath(artifact_dir), registry_dir)
+    entries[category]['model_version'] = version
+
+    # Replace atomically so the prediction stage never reads a half-written registry
+    temporary_path = f'{registry_path}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as registry_file:
+        json.dump(entries, registry_file, indent=4, ensure_ascii=False)
+    os.replace(temporary_path, registry_path)
+
+
+def main():
+    """
+    Retrain the registered price models from app.products.
+
+    For every category in the model registry (or the ones passed with --category) the
+    priced products are streamed through the category's DatasetCleanupManager, a forest is
+    picked by a parallel randomized k-fold search and fitted, and a versioned artifact with
+    its metrics is written under [Training] output_dir/<category>/<version>. Pass --activate
+    to point the registry at the new versions. Progress and timings are logged to
+    logs/training/train_model.log; the exit code is 1 if any category failed.
+    """
+    parser = argparse.ArgumentParser(description='Retrain the registered price models')
+    parser.add_argument('--category', action='append', help='Category to retrain, repeatable (default: every registered category)')
+    parser.add_argument('--activate', action='store_true', help='Point the model registry at the new versions')
+    args = parser.parse_args()
+
+    global_cfg = ConfigParser()
+    global_cfg.read('cfg.ini')
+    env_cfg = ConfigParser()
+    env_cfg.read('cfg-secret.ini')
+
+    os.makedirs('logs/training', exist_ok=True)
+    logger = get_logger(
+        name="model_training",
+        log_level="INFO",
+        log_to_console=True,
+        log_to_file=True,
+        log_file_path="logs/training/train_model.log",
+        rotate_logs=True,
+        max_log_size_mb=10,
+        backup_count=7
+    )
+
+    training_cfg = global_cfg['Training']
+    registry_path = global_cfg['Regression']['registry_path']
+    model_registry = ModelRegistry(registry_path)
+    db_manager = MongoManager(env_cfg['Mongo']['connection_string'])
+
+    version = datetime.now().strftime('%Y_%m_%d_%H%M%S')
+    failed_categories = []
+    for category in args.category or model_registry.categories():
+        try:
+            entry = model_registry.entry(category)
+            began = time.perf_counter()
+
+            features, prices, dropped = load_training_set(
+                db_manager,
+                'app',
+                'products',
+                category,
+                entry.get('online_mag'),
+                model_registry.get_cleanup_manager(category),
+                training_cfg.getint('chunk_size', fallback=5000)
+            )
+            load_s = time.perf_counter() - began
+            logger.info(f"{category}: loaded {len(features)} priced products in {load_s:.2f} seconds")
+            if dropped:
+                logger.warning(f"{category}: dropped {dropped} products with features that are not numbers")
+            if len(features) < training_cfg.getint('folds', fallback=5):
+                logger.warning(f"{category}: not enough products to train, skipping")
+                continue
+
+            model, metrics = train(
+                features,
+                prices,
+                folds=training_cfg.getint('folds', fallback=5),
+                search_iterations=training_cfg.getint('search_iterations', fallback=20),
+                search_rows=training_cfg.getint('search_rows', fallback=20000),
+                n_jobs=training_cfg.getint('n_jobs', fallback=-1)
+            )
+
+            metrics = {
+                'version': version,
+                'category': category,
+                'feature_spec': entry['feature_spec'],
+                'online_mag': entry.get('online_mag'),
+                'trained_at': datetime.now().isoformat(),
+                'load_s': round(load_s, 2),
+                'dropped_rows': dropped,
+                **metrics,
+                'total_s': round(time.perf_counter() - began, 2),
+            }
+            output_dir = os.path.join(training_cfg['output_dir'], category)
+            artifact_dir = write_version(model, metrics, output_dir, version)
+            logger.info(
+                f"{category}: version {version} -- cv mae {metrics['cv']['mae']}, rmse {metrics['cv']['rmse']}, "
+                f"r2 {metrics['cv']['r2']}; search {metrics['search_s']}s, fit {metrics['fit_s']}s, total {metrics['total_s']}s"
+            )
+
+            if args.activate:
+                activate_version(registry_path, category, artifact_dir, version)
+                logger.info(f"{category}: registry now points at {artifact_dir}")
+        except Exception as e:
+            logger.exception(f"{category}: training failed: {str(e)}")
+            failed_categories.append(category)
+
+    return 1 if failed_categories else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,197 @@
+import os
+import json
 import subprocess
 import signal
 import time
 
+from utils.os_utils import OsUtils
+
 class ScraperManager():
     __scraper_paths: list[str]
+    __output_paths: list[str]
+    __tree_paths: list[str]
+    __shard_counts: list[int]
 
-    def __init__(self, scraper_paths):
+    def __init__(self, scraper_paths, output_paths = None, tree_paths = None, shard_counts = None, max_restarts = 2, kill_grace = 60, poll_interval = 1):
         self.__scraper_paths = scraper_paths
-    
+        self.__output_paths = output_paths if output_paths is not None else [None] * len(scraper_paths)
+        self.__tree_paths = tree_paths if tree_paths is not None else [None] * len(scraper_paths)
+        self.__shard_counts = shard_counts if shard_counts is not None else [1] * len(scraper_paths)
+        self.__max_restarts = max_restarts
+        self.__kill_grace = kill_grace
+        self.__poll_interval = poll_interval
+
     def scrape_for_interval(self, scrape_interval):
-        processes = []
-        signals = []
-        try: 
-            for script in self.__scraper_paths:
-                process = subprocess.Popen(['python3', script], stdout=None, stderr=subprocess.DEVNULL)
-                processes.append(process)
-                signals.append(process.pid)
-            
-            time.sleep(scrape_interval)
-            
-            for process in processes:
-                if process.poll() is None:
-                    process.send_signal(signal.SIGINT)
-            
+        """
+        Run every scraper under supervision and return once all of them have exited.
+
+        A scraper that crashes before its deadline is restarted (it resumes from its
+        dying_gasp checkpoint) up to max_restarts times. A scraper still running at
+        its deadline receives SIGINT, and SIGKILL if it has not exited kill_grace
+        seconds later.
+
+        A scraper with a shard count K > 1 gets its category tree split into K
+        shard files and runs as K workers, each with its own dying_gasp checkpoint
+        and output shard. The shards are merged into the daily output file once
+        every worker has exited, dropping duplicate product codes.
+
+        Args:
+            scrape_interval: Deadline in seconds for each scraper, counted from its first start
+
+        Returns:
+            List of per-scraper reports with exit code, wall time, restarts and product count
+        """
+        runs = []
+        merges = []
+        try:
+            for script, output_path, tree_path, shard_count in zip(self.__scraper_paths, self.__output_paths, self.__tree_paths, self.__shard_counts):
+                if shard_count <= 1:
+                    runs.append(self.__new_run(script, output_path, None, [], scrape_interval))
+                    continue
+
+                shard_outputs = []
+                for shard, shard_tree in enumerate(self.split_tree(tree_path, shard_count)):
+                    shard_output = self.shard_path(output_path, shard)
+                    shard_outputs.append(shard_output)
+                    runs.append(self.__new_run(script, shard_output, shard, ['--tree', shard_tree, '--shard', str(shard)], scrape_interval))
+                merges.append((output_path, shard_outputs))
+
+            while any(run['exit_code'] is None for run in runs):
+                for run in runs:
+                    if run['exit_code'] is None:
+                        self.__supervise(run)
+                time.sleep(self.__poll_interval)
+
             print('---- Scraping Ended ----')
         except Exception as e:
             print(e)
+            for run in runs:
+                if run['process'].poll() is None:
+                    run['process'].send_signal(signal.SIGINT)
+
+        reports = [self.__report(run) for run in runs]
+
+        for output_path, shard_outputs in merges:
+            try:
+                merged = self.merge_shards(output_path, shard_outputs)
+                print(f"Merged {len(shard_outputs)} shards into {output_path} -- {merged} new products")
+            except Exception as e:
+                print(f"Error merging shards into {output_path}: {str(e)}")
+
+        return reports
+
+    @staticmethod
+    def shard_path(path, shard):
+        root, extension = os.path.splitext(path)
+        return f"{root}_shard{shard}{extension}"
+
+    @staticmethod
+    def split_tree(tree_path, shard_count):
+        """
+        Split a category tree file into shard_count files, dealing lines round-robin
+        so that large and small categories are spread evenly.
+
+        Returns:
+            Paths of the shard tree files
+        """
+        with open(tree_path, 'r') as tree_file:
+            categories = [line.strip() for line in tree_file if line.strip()]
+
+        shard_paths = []
+        for shard in range(shard_count):
+            shard_tree = ScraperManager.shard_path(tree_path, shard)
+            with open(shard_tree, 'w') as shard_file:
+                for category in categories[shard::shard_count]:
+                    shard_file.write(category + '\n')
+            shard_paths.append(shard_tree)
+        return shard_paths
+
+    @staticmethod
+    def merge_shards(output_path, shard_outputs):
+        """
+        Append the products of every shard to the daily output file, skipping
+        product codes that are already present, then remove the shard files.
+
+        Returns:
+            Number of products appended
+        """
+        seen_codes = set()
+        if os.path.exists(output_path):
+            seen_codes.update(product.get('product_code') for product in OsUtils.streamFromJsonFile([output_path]))
+
+        merged = 0
+        with open(output_path, 'a', encoding='utf-8') as output_file:
+            for shard_output in shard_outputs:
+                if not os.path.exists(shard_output):
+                    continue
+                for product in OsUtils.streamFromJsonFile([shard_output]):
+                    if product.get('product_code') in seen_codes:
+                        continue
+                    seen_codes.add(product.get('product_code'))
+                    output_file.write(json.dumps(product, ensure_ascii=False) + '\n')
+                    merged += 1
+            output_file.flush()
+            os.fsync(output_file.fileno())
+
+        for shard_output in shard_outputs:
+            if os.path.exists(shard_output):
+                os.remove(shard_output)
+        return merged
+
+    def __new_run(self, script, output_path, shard, args, scrape_interval):
+        started = time.monotonic()
+        return {
+            'scraper': script,
+            'shard': shard,
+            'args': args,
+            'output': output_path,
+            'process': self.__start(script, args),
+            'started': started,
+            'deadline': started + scrape_interval,
+            'interrupted_at': None,
+            'restarts': 0,
+            'exit_code': None,
+            'wall_time_s': None,
+        }
+
+    def __start(self, script, args):
+        return subprocess.Popen(['python3', script] + args, stdout=None, stderr=subprocess.DEVNULL)
+
+    def __supervise(self, run):
+        now = time.monotonic()
+        exit_code = run['process'].poll()
+
+        if exit_code is None:
+            if run['interrupted_at'] is None and now >= run['deadline']:
+                print(f"Deadline reached for {run['scraper']} -- sending SIGINT")
+                run['process'].send_signal(signal.SIGINT)
+                run['interrupted_at'] = now
+            elif run['interrupted_at'] is not None and now >= run['interrupted_at'] + self.__kill_grace:
+                print(f"{run['scraper']} ignored SIGINT -- killing it")
+                run['process'].kill()
+            return
+
+        crashed = exit_code != 0 and run['interrupted_at'] is None
+        if crashed and run['restarts'] < self.__max_restarts and now < run['deadline']:
+            run['restarts'] += 1
+            print(f"{run['scraper']} exited with code {exit_code} -- restart {run['restarts']}/{self.__max_restarts} from its dying gasp")
+            run['process'] = self.__start(run['scraper'], run['args'])
+            return
+
+        run['exit_code'] = exit_code
+        run['wall_time_s'] = round(now - run['started'], 2)
+
+    def __report(self, run):
+        product_count = None
+        if run['output'] is not None and os.path.exists(run['output']):
+            product_count = sum(1 for _ in OsUtils.streamFromJsonFile([run['output']]))
+
+        return {
+            'scraper': run['scraper'],
+            'shard': run['shard'],
+            'exit_code': run['exit_code'],
+            'wall_time_s': run['wall_time_s'],
+            'restarts': run['restarts'],
+            'timed_out': run['interrupted_at'] is not None,
+            'product_count': product_count,
+        }
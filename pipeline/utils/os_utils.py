@@ -1,22 +1,104 @@
+import os
 import json
+import time
 
 class OsUtils:
+    __CHUNK_SIZE = 1 << 16
 
     @staticmethod
     def readFromJsonFile(output_paths:list[str]):
-        products_list = []
+        return list(OsUtils.streamFromJsonFile(output_paths))
+
+    @staticmethod
+    def streamFromJsonFile(output_paths:list[str]):
+        """
+        Lazily yield products from scraper output files.
+
+        Both the append-only JSONL format and the legacy JSON array format are
+        supported; the format is detected from the first character of each file.
+        """
         for path in output_paths:
             try:
                 with open(path, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    if isinstance(data, list):
-                        products_list.extend(data)
-                    elif isinstance(data, dict):
-                        products_list.append(data)
-                        
+                    head = file.read(1)
+                    while head.isspace():
+                        head = file.read(1)
+                    file.seek(0)
+
+                    if head == '[':
+                        yield from OsUtils.__streamJsonArray(file)
+                    elif head == '{':
+                        yield from OsUtils.__streamJsonLines(file, path)
+
                 print(f"Processed: {path}")
             except json.JSONDecodeError:
                 print(f"Error: Could not parse JSON in {path}")
             except Exception as e:
                 print(f"Error processing {path}: {str(e)}")
-        return products_list
+
+    @staticmethod
+    def tailJsonFile(output_paths:list[str], is_done, poll_interval:float = 5):
+        """
+        Follow JSONL files that are still being written, yielding every complete
+        line once. Stops after the first pass that starts when is_done() is True.
+        A trailing line without a newline is treated as still being written.
+        """
+        positions = {path: 0 for path in output_paths}
+        while True:
+            finished = is_done()
+            for path in output_paths:
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'r', encoding='utf-8') as file:
+                    file.seek(positions[path])
+                    while True:
+                        line = file.readline()
+                        if not line.endswith('\n'):
+                            break
+                        positions[path] = file.tell()
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            yield json.loads(line)
+                        except json.JSONDecodeError:
+                            print(f"Error: Could not parse line in {path}")
+            if finished:
+                return
+            time.sleep(poll_interval)
+
+    @staticmethod
+    def __streamJsonLines(file, path):
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A scraper killed mid-write leaves a truncated last line
+                print(f"Error: Could not parse line {line_number} in {path}")
+
+    @staticmethod
+    def __streamJsonArray(file):
+        decoder = json.JSONDecoder()
+        buffer = file.read(OsUtils.__CHUNK_SIZE).lstrip()[1:]
+
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+
+            try:
+                if not buffer:
+                    raise json.JSONDecodeError('Incomplete buffer', buffer, 0)
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = file.read(OsUtils.__CHUNK_SIZE)
+                if not chunk:
+                    raise
+                buffer += chunk
+                continue
+
+            yield item
+            buffer = buffer[end:]
@@ -0,0 +1,115 @@
+import time
+from collections import Counter
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class DriverPool:
+    """
+    Keeps one WebDriver session alive across listing pages and recycles it
+    only when a configured limit is reached, instead of restarting the
+    browser after every page.
+
+    A session is recycled when any of these limits is hit (0 disables a limit):
+    - max_pages: number of listing pages served by the session
+    - max_rss_mb: resident memory of the driver and its browser processes (requires psutil)
+    - max_errors: consecutive failed pages
+    """
+    __driver = None
+
+    def __init__(self, driver_factory, max_pages:int = 50, max_rss_mb:int = 0, max_errors:int = 3):
+        self.__driver_factory = driver_factory
+        self.__max_pages = max_pages
+        self.__max_rss_mb = max_rss_mb
+        self.__max_errors = max_errors
+
+        self.__session_pages = 0
+        self.__session_errors = 0
+
+        self.__startup_times = []
+        self.__page_times = []
+        self.__recycle_reasons = Counter()
+
+    def acquire(self):
+        """Return the live driver, starting a new session if there is none."""
+        if self.__driver is None:
+            started = time.perf_counter()
+            self.__driver = self.__driver_factory()
+            self.__startup_times.append(time.perf_counter() - started)
+            self.__session_pages = 0
+            self.__session_errors = 0
+        return self.__driver
+
+    def page_done(self, page_time:float):
+        """Record a successful page, clear browser state and recycle if a limit was reached."""
+        self.__page_times.append(page_time)
+        self.__session_pages += 1
+        self.__session_errors = 0
+        self.__clear_state()
+        self.__check_limits()
+
+    def page_failed(self):
+        """Record a failed page; repeated failures recycle the session."""
+        self.__session_errors += 1
+        self.__check_limits()
+
+    def close(self):
+        if self.__driver is not None:
+            try:
+                self.__driver.quit()
+            except Exception as e:
+                print(f"Driver quit error: {str(e)}")
+            self.__driver = None
+
+    def report(self) -> dict:
+        """Summarize driver startup time versus page time for the current run."""
+        startup_total = sum(self.__startup_times)
+        page_total = sum(self.__page_times)
+        return {
+            'sessions': len(self.__startup_times),
+            'pages': len(self.__page_times),
+            'startup_total_s': round(startup_total, 2),
+            'startup_mean_s': round(startup_total / len(self.__startup_times), 2) if self.__startup_times else 0,
+            'page_total_s': round(page_total, 2),
+            'page_mean_s': round(page_total / len(self.__page_times), 2) if self.__page_times else 0,
+            'startup_share': round(startup_total / (startup_total + page_total), 4) if startup_total + page_total else 0,
+            'recycle_reasons': dict(self.__recycle_reasons),
+        }
+
+    def __clear_state(self):
+        # Reset cookies and web storage so the next page starts clean without a browser restart
+        try:
+            self.__driver.delete_all_cookies()
+            self.__driver.execute_script('window.localStorage.clear(); window.sessionStorage.clear();')
+        except Exception:
+            pass
+
+    def __check_limits(self):
+        if self.__driver is None:
+            return
+
+        reason = None
+        if self.__max_errors and self.__session_errors >= self.__max_errors:
+            reason = 'errors'
+        elif self.__max_pages and self.__session_pages >= self.__max_pages:
+            reason = 'pages'
+        elif self.__max_rss_mb and self.__session_rss_mb() >= self.__max_rss_mb:
+            reason = 'rss'
+
+        if reason is not None:
+            self.__recycle_reasons[reason] += 1
+            self.close()
+
+    def __session_rss_mb(self) -> float:
+        if psutil is None:
+            return 0
+        try:
+            process = psutil.Process(self.__driver.service.process.pid)
+            rss = process.memory_info().rss
+            rss += sum(child.memory_info().rss for child in process.children(recursive=True))
+        except (psutil.Error, AttributeError):
+            return 0
+        return rss / (1024 * 1024)
@@ -0,0 +1,87 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+
+
+class FingerprintCache:
+    """
+    Local cache of detail-page data keyed by (online_mag, url), used to skip
+    detail pages whose data is already known.
+
+    A lookup returns the cached details when:
+    - the entry is younger than fresh_hours, or
+    - the entry is younger than ttl_hours and the listing fingerprint
+      (price, stock, ...) is unchanged since it was stored.
+    Anything else is a miss and the caller re-fetches the detail page.
+    A ttl_hours of 0 disables the cache.
+    """
+
+    def __init__(self, path:str, fresh_hours:float = 24, ttl_hours:float = 168):
+        self.__fresh_seconds = fresh_hours * 3600
+        self.__ttl_seconds = ttl_hours * 3600
+        self.__lock = threading.Lock()
+        self.__stats = Counter()
+
+        self.__connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints ('
+            'online_mag TEXT NOT NULL, '
+            'url TEXT NOT NULL, '
+            'fingerprint TEXT NOT NULL, '
+            'details TEXT NOT NULL, '
+            'fetched_at REAL NOT NULL, '
+            'PRIMARY KEY (online_mag, url))'
+        )
+        self.__connection.commit()
+
+    @staticmethod
+    def fingerprint(*values) -> str:
+        return hashlib.sha1(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def lookup(self, online_mag:str, url:str, fingerprint:str):
+        """Return the cached details for a product, or None if they must be re-fetched."""
+        if not self.__ttl_seconds:
+            return None
+
+        with self.__lock:
+            row = self.__connection.execute(
+                'SELECT fingerprint, details, fetched_at FROM fingerprints WHERE online_mag = ? AND url = ?',
+                (online_mag, url)
+            ).fetchone()
+
+            if row is None:
+                self.__stats['miss'] += 1
+                return None
+
+            cached_fingerprint, details, fetched_at = row
+            age = time.time() - fetched_at
+            if age < self.__fresh_seconds:
+                self.__stats['hit_fresh'] += 1
+            elif age < self.__ttl_seconds and cached_fingerprint == fingerprint:
+                self.__stats['hit_unchanged'] += 1
+            else:
+                self.__stats['expired' if age >= self.__ttl_seconds else 'changed'] += 1
+                return None
+
+        return json.loads(details)
+
+    def store(self, online_mag:str, url:str, fingerprint:str, details:dict):
+        if not self.__ttl_seconds:
+            return
+
+        with self.__lock:
+            self.__connection.execute(
+                'INSERT OR REPLACE INTO fingerprints (online_mag, url, fingerprint, details, fetched_at) VALUES (?, ?, ?, ?, ?)',
+                (online_mag, url, fingerprint, json.dumps(details, ensure_ascii=False), time.time())
+            )
+            self.__connection.commit()
+
+    def report(self) -> dict:
+        return dict(self.__stats)
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
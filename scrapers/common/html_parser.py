@@ -0,0 +1,34 @@
+from bs4 import BeautifulSoup
+
+# Tree builders in order of preference; html.parser ships with Python and is always available
+PARSER_BACKENDS = ('lxml', 'html.parser')
+FALLBACK_BACKEND = 'html.parser'
+
+
+def available_backends() -> list[str]:
+    """Return the parser backends that can be used in this environment."""
+    backends = []
+    for backend in PARSER_BACKENDS:
+        try:
+            BeautifulSoup('<p></p>', backend)
+            backends.append(backend)
+        except Exception:
+            continue
+    return backends
+
+
+def resolve_backend(preferred:str) -> str:
+    """Return the preferred backend if it is installed, otherwise the BeautifulSoup fallback."""
+    if preferred in available_backends():
+        return preferred
+    print(f'WARNING: HTML parser backend {preferred} is not available, falling back to {FALLBACK_BACKEND}')
+    return FALLBACK_BACKEND
+
+
+def make_soup(markup, backend:str = FALLBACK_BACKEND) -> BeautifulSoup:
+    return BeautifulSoup(markup, backend)
+
+
+def first_tag(element):
+    """First tag below element, without materializing every descendant."""
+    return element.find(True)
@@ -0,0 +1,177 @@
+import os
+import json
+import queue
+import hashlib
+import tempfile
+import threading
+import requests
+from collections import Counter
+from requests.adapters import HTTPAdapter
+
+
+class ImageDownloader:
+    """
+    Background image download stage fed by a queue, so image I/O never
+    blocks the scraping loop.
+
+    A sidecar index (image name -> url, ETag, Last-Modified, sha256) lets
+    re-runs skip unchanged images:
+    - an image already on disk with no index entry is adopted as is
+    - known images are revalidated with If-None-Match / If-Modified-Since,
+      or kept without a request when the server sent no validators
+    - a 200 response whose content hash matches the index is not rewritten
+    Files are written to a temporary name and renamed into place.
+    """
+    __STOP = object()
+    __INDEX_SAVE_EVERY = 100
+
+    def __init__(self, output_dir:str, index_path:str, error_log:str, workers:int = 2, revalidate:bool = True, timeout:float = 10):
+        self.__output_dir = output_dir
+        self.__index_path = index_path
+        self.__error_log = error_log
+        self.__revalidate = revalidate
+        self.__timeout = timeout
+
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+
+        self.__index = self.__load_index()
+        self.__index_lock = threading.Lock()
+        self.__pending_index_updates = 0
+
+        self.__seen = set()
+        self.__stats = Counter()
+
+        self.__queue = queue.Queue(maxsize=1000)
+        self.__workers = [threading.Thread(target=self.__work, daemon=True) for _ in range(max(1, workers))]
+        for worker in self.__workers:
+            worker.start()
+
+    def submit(self, image_url:str, img_name:str, label:str = ''):
+        """
+        Queue an image for download. Images already queued in this run are ignored.
+
+        Args:
+            image_url: Source URL of the image
+            img_name: File name inside the output directory
+            label: Product name used in error log lines
+        """
+        with self.__index_lock:
+            if img_name in self.__seen:
+                self.__stats['duplicate'] += 1
+                return
+            self.__seen.add(img_name)
+        self.__queue.put((image_url, img_name, label))
+
+    def close(self):
+        """Drain the queue, stop the workers and persist the index."""
+        for _ in self.__workers:
+            self.__queue.put(self.__STOP)
+        for worker in self.__workers:
+            worker.join()
+        with self.__index_lock:
+            self.__save_index()
+        self.__session.close()
+
+    def report(self) -> dict:
+        return dict(self.__stats)
+
+    def __work(self):
+        while True:
+            job = self.__queue.get()
+            if job is self.__STOP:
+                return
+            image_url, img_name, label = job
+            try:
+                outcome = self.__download(image_url, img_name)
+            except Exception as e:
+                outcome = 'failed'
+                with open(self.__error_log, 'a') as logs:
+                    logs.write('ERR FOR IMAGE SCRAPING: ' + label)
+                    logs.write('ERR: ' + str({e}) + '\n')
+            with self.__index_lock:
+                self.__stats[outcome] += 1
+
+    def __download(self, image_url:str, img_name:str) -> str:
+        filepath = os.path.join(self.__output_dir, img_name)
+        with self.__index_lock:
+            entry = self.__index.get(img_name)
+
+        headers = {}
+        if os.path.exists(filepath):
+            if entry is None:
+                self.__update_index(img_name, {'url': image_url, 'sha256': self.__hash_file(filepath)})
+                return 'adopted'
+
+            if entry.get('url') == image_url:
+                # Without validators there is no cheap way to revalidate, keep the file
+                if not self.__revalidate or not (entry.get('etag') or entry.get('last_modified')):
+                    return 'skipped'
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.__session.get(image_url, headers=headers, timeout=self.__timeout)
+        if response.status_code == 304:
+            return 'not_modified'
+        response.raise_for_status()
+
+        img_data = response.content
+        digest = hashlib.sha256(img_data).hexdigest()
+        new_entry = {
+            'url': image_url,
+            'sha256': digest,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+
+        if entry is not None and entry.get('sha256') == digest and os.path.exists(filepath):
+            self.__update_index(img_name, new_entry)
+            return 'unchanged'
+
+        self.__write_atomic(filepath, img_data)
+        self.__update_index(img_name, new_entry)
+        return 'downloaded'
+
+    def __write_atomic(self, filepath:str, data:bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), prefix='.tmp-', suffix='.jpeg')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, filepath)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def __hash_file(self, filepath:str) -> str:
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 16), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def __update_index(self, img_name:str, entry:dict):
+        with self.__index_lock:
+            self.__index[img_name] = entry
+            self.__pending_index_updates += 1
+            if self.__pending_index_updates >= self.__INDEX_SAVE_EVERY:
+                self.__save_index()
+
+    def __load_index(self) -> dict:
+        try:
+            with open(self.__index_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def __save_index(self):
+        # Caller holds the index lock
+        tmp_path = self.__index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.__index, file)
+        os.replace(tmp_path, self.__index_path)
+        self.__pending_index_updates = 0
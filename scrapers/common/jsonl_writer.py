@@ -0,0 +1,51 @@
+import os
+import json
+
+
+class JsonlWriter:
+    """
+    Append-only newline-delimited JSON sink for scraper output.
+
+    Every batch is serialized to one line per product, appended with a single
+    write and fsynced, so the cost of a batch depends only on the batch itself
+    and not on how many products are already in the file.
+    """
+    __path : str
+    __file = None
+
+    def __init__(self, path:str):
+        self.__path = path
+        self.__file = open(path, 'a', encoding='utf-8')
+
+    @property
+    def path(self):
+        return self.__path
+
+    def write_batch(self, records:list[dict]) -> int:
+        """
+        Append a batch of records and flush it to disk.
+
+        Args:
+            records: List of product dictionaries
+
+        Returns:
+            Number of records written
+        """
+        if not records:
+            return 0
+
+        payload = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        self.__file.write(payload)
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        return len(records)
+
+    def close(self):
+        if self.__file is not None and not self.__file.closed:
+            self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,136 @@
+import time
+import threading
+import requests
+from collections import Counter
+from requests.adapters import HTTPAdapter
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from common.html_parser import make_soup, FALLBACK_BACKEND
+
+
+class PageFetcher:
+    """
+    Fetches product detail pages over a pooled HTTP session and falls back
+    to a WebDriver only when the server-rendered HTML cannot be parsed.
+
+    The parse callback receives a BeautifulSoup document and must raise if a
+    required element is missing, which is what triggers the fallback.
+
+    The fetcher may be shared by worker threads: every request waits on the
+    optional rate limiter, and driver fallbacks are serialized because a
+    WebDriver session cannot be used from several threads at once.
+    """
+    DEFAULT_HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:136.0) Gecko/20100101 Firefox/136.0',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Encoding': 'gzip, deflate',
+        'Accept-Language': 'ro-RO,ro;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Connection': 'keep-alive',
+    }
+
+    __session : requests.Session
+
+    def __init__(self, timeout:float = 10, pool_size:int = 10, wait_for_class:str = None, wait_timeout:float = 2, rate_limiter = None, parser_backend:str = FALLBACK_BACKEND):
+        self.__timeout = timeout
+        self.__wait_for_class = wait_for_class
+        self.__wait_timeout = wait_timeout
+        self.__rate_limiter = rate_limiter
+        self.__parser_backend = parser_backend
+        self.__driver_lock = threading.Lock()
+        self.__stats_lock = threading.Lock()
+
+        self.__session = requests.Session()
+        self.__session.headers.update(self.DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+
+        self.__stats = Counter()
+        self.__times = Counter()
+
+    @property
+    def session(self) -> requests.Session:
+        return self.__session
+
+    def fetch(self, url:str, parse, driver = None):
+        """
+        Parse a page fetched over HTTP, retrying through the driver if that fails.
+
+        Args:
+            url: Page URL
+            parse: Callable taking a BeautifulSoup document and returning the extracted data
+            driver: Optional WebDriver used as the fallback path
+
+        Returns:
+            Whatever parse returns
+        """
+        try:
+            return self.fetch_http(url, parse)
+        except Exception:
+            if driver is None:
+                raise
+        return self.fetch_driver(url, parse, driver)
+
+    def fetch_http(self, url:str, parse):
+        self.__throttle()
+        started = time.perf_counter()
+        try:
+            response = self.__session.get(url, timeout=self.__timeout)
+            response.raise_for_status()
+            result = parse(make_soup(response.text, self.__parser_backend))
+        except Exception:
+            self.__record('http_failed')
+            raise
+        self.__record('http', time.perf_counter() - started)
+        return result
+
+    def fetch_driver(self, url:str, parse, driver):
+        with self.__driver_lock:
+            self.__throttle()
+            started = time.perf_counter()
+            try:
+                driver.delete_all_cookies()
+                driver.get(url)
+                if self.__wait_for_class is not None:
+                    WebDriverWait(driver, self.__wait_timeout).until(
+                        EC.presence_of_element_located((By.CLASS_NAME, self.__wait_for_class))
+                    )
+                page_source = driver.page_source
+            except Exception:
+                self.__record('driver_failed')
+                raise
+
+        try:
+            result = parse(make_soup(page_source, self.__parser_backend))
+        except Exception:
+            self.__record('driver_failed')
+            raise
+        self.__record('driver', time.perf_counter() - started)
+        return result
+
+    def report(self) -> dict:
+        """Summarize how many pages went through each path and their mean time."""
+        return {
+            'http_pages': self.__stats['http'],
+            'http_failed': self.__stats['http_failed'],
+            'driver_pages': self.__stats['driver'],
+            'driver_failed': self.__stats['driver_failed'],
+            'http_mean_s': round(self.__times['http'] / self.__stats['http'], 3) if self.__stats['http'] else 0,
+            'driver_mean_s': round(self.__times['driver'] / self.__stats['driver'], 3) if self.__stats['driver'] else 0,
+        }
+
+    def close(self):
+        self.__session.close()
+
+    def __throttle(self):
+        if self.__rate_limiter is not None:
+            self.__rate_limiter.acquire()
+
+    def __record(self, outcome:str, elapsed:float = None):
+        with self.__stats_lock:
+            self.__stats[outcome] += 1
+            if elapsed is not None:
+                self.__times[outcome] += elapsed
@@ -0,0 +1,33 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting how many requests per second are sent
+    to a retailer. Up to `capacity` requests may go out back to back, after
+    which callers are paced at `rate` requests per second.
+    """
+
+    def __init__(self, rate:float, capacity:int = 1):
+        if rate <= 0:
+            raise ValueError(f"Invalid rate: {rate}. Must be greater than 0")
+        self.__rate = rate
+        self.__capacity = max(1, capacity)
+        self.__tokens = float(self.__capacity)
+        self.__last_refill = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and consume it."""
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.__capacity, self.__tokens + (now - self.__last_refill) * self.__rate)
+                self.__last_refill = now
+
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                wait = (1 - self.__tokens) / self.__rate
+            time.sleep(wait)
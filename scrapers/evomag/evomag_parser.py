@@ -0,0 +1,82 @@
+import re
+
+STOCK_CLASS = re.compile('stock_', re.IGNORECASE)
+
+
+def parse_listing_item(item) -> dict:
+    """
+    Extract the listing-card fields of an evomag product.
+
+    Args:
+        item: First tag inside a `nice_product_item` element
+    """
+    name = item.find_next(class_='npi_name').text.strip()
+    itemUrl = 'https://www.evomag.ro' + item.find_next(class_='npi_name').h2.a['href']
+    isInStoc = item.find_next(class_=STOCK_CLASS).text.strip()
+    if isInStoc[:2] == 'In':
+        isInStoc = 1
+    else:
+        isInStoc = 0
+    price = item.find_next(class_='real_price').text.split(' ')[0].replace('.','')
+    price = float(price[:-2] + '.' + price[-2:])
+
+    try:
+        #evomag are hidden un 'fa cadou' in care mai e o imagine care este scraped din greseala
+        #imaginea e ascunsa in item, asa ca item.find_next o ia pe ea in loc de imaginea cautata
+        #Solutie --> move forward to the next sibling si apoi apeleaza find_next()
+        imageUrl = item.next_sibling.find_next(loading = 'lazy')
+        if imageUrl['alt']=='Offer':
+            imageUrl = imageUrl.find_next(loading = 'lazy')['src']
+        else :
+            imageUrl =imageUrl['src']
+    except Exception as e:
+        imageUrl = 'err'
+
+    return {
+        'name': name,
+        'url': itemUrl,
+        'is_in_stoc': isInStoc,
+        'price': price,
+        'image_url': imageUrl,
+    }
+
+
+def parse_product_page(soup) -> dict:
+    """
+    Extract the detail-page fields of an evomag product.
+
+    Raises if the page does not contain the expected elements, so callers can
+    retry the page through a browser.
+    """
+    #Page may or may not have many more em elements
+    #Solution --> go to a page element and get all the above needed em's
+    em_elems = soup.find(class_='product_info_area').find_all_previous('em')
+    manufacturer = em_elems[1].text.strip()
+
+    number_of_reviews = int(soup.select('.product_rating a')[0].text.split(' ')[0])
+
+    rating = len(soup.find_all(class_='fa-star'))
+
+    product_code = soup.find(class_='code-value').text.strip()
+    product_code = product_code.replace('/','+rep+')
+
+    table_rows = soup.find(class_='produs_body_tech').find_all_next('td')
+    specification_dict = {}
+
+    i=0
+    while (i < len(table_rows)):
+        if not table_rows[i].has_attr('class'):
+            key = table_rows[i].text
+            value = table_rows[i+1].text
+            specification_dict[key] = value
+            i+=2
+        else:
+            i+=1
+
+    return {
+        'manufacturer': manufacturer,
+        'number_of_reviews': number_of_reviews,
+        'rating': rating,
+        'product_code': product_code,
+        'specifications': specification_dict,
+    }
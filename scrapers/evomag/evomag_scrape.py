@@ -1,19 +1,25 @@
-import re
 import os
-import csv
-import requests
+import sys
+import argparse
 import datetime
 import configparser
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
 
-from bs4 import NavigableString
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.jsonl_writer import JsonlWriter
+from common.driver_pool import DriverPool
+from common.page_fetcher import PageFetcher
+from common.rate_limiter import TokenBucket
+from common.image_downloader import ImageDownloader
+from common.html_parser import make_soup, first_tag, resolve_backend
+from common.fingerprint_cache import FingerprintCache
+from evomag_parser import parse_listing_item, parse_product_page
 
 
 def create_driver():
@@ -42,14 +48,46 @@ currentDate = datetime.datetime.now().strftime('%Y_%m_%d')
 config = configparser.ConfigParser()
 config.read('/home/tav/Desktop/licenta/cfg.ini')
 
-latest_path = None
+arg_parser = argparse.ArgumentParser(description='evomag scraper')
+arg_parser.add_argument('--tree', default=config['Paths']['evomag_output'] + 'evomag_tree.txt', help='Category tree file to scrape')
+arg_parser.add_argument('--shard', default=None, help='Shard id, suffixes the output and dying gasp files of this worker')
+args = arg_parser.parse_args()
+shard_suffix = '' if args.shard is None else '_shard' + args.shard
 
-def no_nav_strings(iterable):
-    return list(filter(lambda x: type(x) != NavigableString, iterable))
+latest_path = None
+html_backend = resolve_backend(config['Scrapers'].get('html_parser', fallback='lxml'))
+output_writer = JsonlWriter(config['Paths']['evomag_output'] + 'evomag_' + str(currentDate) + shard_suffix + '.jsonl')
+driver_pool = DriverPool(
+    create_driver,
+    max_pages=config['Scrapers'].getint('driver_recycle_pages', fallback=50),
+    max_rss_mb=config['Scrapers'].getint('driver_recycle_rss_mb', fallback=0),
+    max_errors=config['Scrapers'].getint('driver_recycle_errors', fallback=3)
+)
+page_fetcher = PageFetcher(
+    parser_backend=html_backend,
+    wait_for_class='product_codes',
+    pool_size=config['Scrapers'].getint('evomag_concurrency', fallback=4),
+    rate_limiter=TokenBucket(
+        config['Scrapers'].getfloat('evomag_requests_per_second', fallback=0.66),
+        config['Scrapers'].getint('evomag_burst', fallback=1)
+    )
+)
+detail_executor = ThreadPoolExecutor(max_workers=config['Scrapers'].getint('evomag_concurrency', fallback=4))
+image_downloader = ImageDownloader(
+    config['Paths']['image_output'],
+    os.path.join(config['Paths']['image_output'], '.image_index_evomag' + shard_suffix + '.json'),
+    config['Paths']['evomag_output'] + 'errLog-' + str(currentDate) + '.txt',
+    workers=config['Scrapers'].getint('image_workers', fallback=2),
+    revalidate=config['Scrapers'].getboolean('image_revalidate', fallback=True)
+)
+fingerprint_cache = FingerprintCache(
+    config['Paths']['evomag_output'] + 'fingerprint_cache.sqlite',
+    fresh_hours=config['Scrapers'].getfloat('incremental_fresh_hours', fallback=24),
+    ttl_hours=config['Scrapers'].getfloat('incremental_ttl_hours', fallback=168)
+)
 
 def format_data(item,driver):
     try:
-        time.sleep(1.5)
         # driver.execute_script("Services.clearData.deleteData(Services.clearData.CLEAR_ALL);")
 
         #time.sleep(5)
@@ -57,90 +95,31 @@ def format_data(item,driver):
         # my_sum = summary.summarize(all_objects)
         # summary.print_(my_sum)
 
-        name = item.find_next(class_='npi_name').text.strip()
-        itemUrl = 'https://www.evomag.ro' + item.find_next(class_='npi_name').h2.a['href']
-        isInStoc = item.find_next(class_=re.compile('stock_', re.IGNORECASE)).text.strip()
-        if isInStoc[:2] == 'In':
-            isInStoc = 1
-        else:
-            isInStoc = 0
-        #price = float(item.find_next(class_='real_price').text.strip().replace(',','.').split(' ')[0])
-        #price = float(item.find_next(class_='real_price').text.split(' ')[0].replace('.','').replace(',','.'))
-        price = item.find_next(class_='real_price').text.split(' ')[0].replace('.','')
-        price = float(price[:-2] + '.' + price[-2:]) 
-
-        try:
-            #evomag are hidden un 'fa cadou' in care mai e o imagine care este scraped din greseala
-            #imaginea e ascunsa in item, asa ca item.find_next o ia pe ea in loc de imaginea cautata
-            #Solutie --> move forward to the next sibling si apoi apeleaza find_next()
-            imageUrl = item.next_sibling.find_next(loading = 'lazy') 
-            if imageUrl['alt']=='Offer':
-                imageUrl = imageUrl.find_next(loading = 'lazy')['src']
-            else :
-                imageUrl =imageUrl['src']
-        except Exception as e:
-            imageUrl = 'err'
-
-        driver.delete_all_cookies()
-        driver.get(itemUrl)
-
-        # Wait for an element with a specific ID to appear (e.g., 'myElement')
-        element = WebDriverWait(driver, 2).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "product_codes"))
-        )
-
-        page_source = driver.page_source
-        other_soup = BeautifulSoup(page_source, 'html.parser')
-
-        #Page may or may not have many more em elements
-        #Solution --> go to a page element and get all the above needed em's
-        em_elems = other_soup.find(class_='product_info_area').find_all_previous('em')
-        manufacturer = em_elems[1].text.strip()
-
-        # product_code = other_soup.find(class_='product_codes').span.text.strip()
-        # match = re.search(r'\[ (.*?) \]', product_code)
-        # if match:
-        #     product_code = match.group(1)
-        #rating_div = other_soup.find(class_='product_rating')
-
-        number_of_reviews = int(other_soup.select('.product_rating a')[0].text.split(' ')[0])
-
-        rating = len(other_soup.find_all(class_='fa-star'))
-
-        product_code = other_soup.find(class_='code-value').text.strip()
-        
-        product_code = product_code.replace('/','+rep+')
-
-        #driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        table_rows = other_soup.find(class_='produs_body_tech').find_all_next('td')
-        specification_dict = {}
-        
-        i=0
-        while (i < len(table_rows)):
-            if not table_rows[i].has_attr('class'):
-                key = table_rows[i].text
-                value = table_rows[i+1].text
-                specification_dict[key] = value
-                i+=2
-            else:
-                i+=1
-            
+        listing = parse_listing_item(item)
+        name = listing['name']
+        itemUrl = listing['url']
+        isInStoc = listing['is_in_stoc']
+        price = listing['price']
+        imageUrl = listing['image_url']
+
+        # Specs rarely change, so the detail page is only loaded on a cache miss
+        fingerprint = FingerprintCache.fingerprint(price, isInStoc)
+        details = fingerprint_cache.lookup('evomag', itemUrl, fingerprint)
+        if details is None:
+            # Server-rendered HTML first, the browser only if that page does not parse
+            details = page_fetcher.fetch(itemUrl, parse_product_page, driver)
+            fingerprint_cache.store('evomag', itemUrl, fingerprint, details)
+
+        manufacturer = details['manufacturer']
+        number_of_reviews = details['number_of_reviews']
+        rating = details['rating']
+        product_code = details['product_code']
+        specification_dict = details['specifications']
 
         #=====scraping image=====
         if imageUrl != 'err':
-            try:
-                img_data = requests.get(imageUrl).content
-                img_name = product_code + '.jpeg'
-                #
-                filepath = os.path.join(config['Paths']['image_output'], img_name) 
-                with open(filepath, 'wb') as file:
-                    file.write(img_data)
-            except Exception as e:
-                with open(config['Paths']['evomag_output'] + 'errLog-' + str(currentDate) + '.txt', 'a') as logs:
-                    logs.write('ERR FOR IMAGE SCRAPING: ' + name)
-                    logs.write('ERR: ' + str({e}) + '\n')
-                img_name = 'not_found.jpeg'
-            #=====scraping image=====
+            image_downloader.submit(imageUrl, product_code + '.jpeg', name)
+        #=====scraping image=====
 
         print('evomag -- ' + name)
 
@@ -160,17 +139,25 @@ def format_data(item,driver):
     
     except Exception as e:
         print(str({e}))
-        print('EXCEPTION EVOMAG====='+str(name)+str(isInStoc)+'=====EXCEPTION EVOMAG')
+        print('EXCEPTION EVOMAG====='+str(name if 'name' in locals() else 'unknown')+str(isInStoc if 'isInStoc' in locals() else '')+'=====EXCEPTION EVOMAG')
         with open(config['Paths']['evomag_output'] + 'errLog-' + str(currentDate) + '.txt', 'a') as logs:
-            logs.write('ERR IN FORMAT_DATA FOR PRODUCT: ' + name)
+            logs.write('ERR IN FORMAT_DATA FOR PRODUCT: ' + (name if 'name' in locals() else 'unknown'))
             logs.write('ERR: ' + str({e}) + '\n')
     
 
+def settle_detail_futures(futures):
+    # A page left early must not keep detail fetches running on the shared driver and
+    # pool: cancel the ones not started yet and wait for the running ones
+    for future in futures:
+        future.cancel()
+    wait(futures)
+
+def scrape_item(element, driver):
+    return format_data(first_tag(element), driver)
+
 def scrape(path: str):
-    driver = None
-    if driver is None:
-        driver = create_driver()
-    
+    driver = driver_pool.acquire()
+
     if path.rfind("https") == -1:
         target_url = 'https://www.evomag.ro' + path
         current_page = 1
@@ -182,24 +169,19 @@ def scrape(path: str):
     global latest_path
     latest_path = path 
     
-    output_file = config['Paths']['evomag_output'] + 'evomag_' + str(currentDate) + '.json'
-    
-    # Initialize JSON file if it doesn't exist
-    if not os.path.exists(output_file):
-        with open(output_file, 'w') as f:
-            json.dump([], f)
-
     driver.get(target_url + 'filtru/pagina:' + str(current_page))
     element = WebDriverWait(driver, 2)
 
     pagina_existenta = True
     while pagina_existenta:
+        futures = []
         try:
             time.sleep(3)
+            page_started = time.perf_counter()
             current_page += 1
             
             page_source = driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
+            soup = make_soup(page_source, html_backend)
             
             li_items = soup.find_all(class_="nice_product_item")
             if not li_items:
@@ -207,16 +189,18 @@ def scrape(path: str):
                 
             category = soup.find(class_='breadcrumbs').text.strip().split('»')[-1].strip()
             
+            # Detail pages are fetched concurrently, results are written in listing order
+            futures = [detail_executor.submit(scrape_item, element, driver) for element in li_items]
+
             # Process items in batches
             batch_size = 10
-            for i in range(0, len(li_items), batch_size):
-                batch_items = li_items[i:i + batch_size]
+            for i in range(0, len(futures), batch_size):
+                batch_futures = futures[i:i + batch_size]
                 batch_data = []
                 
-                for element in batch_items:
+                for future in batch_futures:
                     try:
-                        element = no_nav_strings(element.descendants)
-                        formatted_dict = format_data(element[0], driver)
+                        formatted_dict = future.result()
                         formatted_dict['category'] = category
                         batch_data.append(formatted_dict)
                         
@@ -226,25 +210,14 @@ def scrape(path: str):
                             logs.write(f'ON PATH: {path}\nPAGE: {current_page}\n')
                         continue
                 
-                # Append batch to JSON file
+                # Append batch to JSONL file
                 if batch_data:
-                    # Read existing data
-                    try:
-                        with open(output_file, 'r') as f:
-                            try:
-                                existing_data = json.load(f)
-                            except json.JSONDecodeError:
-                                existing_data = []
-                    except FileNotFoundError:
-                        existing_data = []
-                    
-                    # Append new data and write back
-                    existing_data.extend(batch_data)
-                    with open(output_file, 'w') as f:
-                        json.dump(existing_data, f, indent=2)
+                    output_writer.write_batch(batch_data)
                 
                 # Clear batch data from memory
                 batch_data.clear()
+
+            driver_pool.page_done(time.perf_counter() - page_started)
             
             # Check for next page
             next_page_button = soup.find(attrs={'class': 'next hidden'})
@@ -258,30 +231,31 @@ def scrape(path: str):
             new_path = target_url + 'filtru/pagina:' + str(current_page)
             latest_path = new_path
 
-            # Clean up and create new driver
-            driver.delete_all_cookies()
-            driver.quit()
-            driver = create_driver()
+            # Reuse the session unless the pool decided to recycle it
+            driver = driver_pool.acquire()
             driver.get(new_path)
             
         except Exception as e:
             print(f"Page processing error: {str(e)}")
+            # Detail fetches may still be using the driver that page_failed can quit
+            settle_detail_futures(futures)
+            driver_pool.page_failed()
             break
-            
-    driver.quit()
+        finally:
+            settle_detail_futures(futures)
 
 
 def main():
     try:
-        origin = os.path.join(config['Paths']['evomag_output'], 'dying_gasp_' + str(currentDate) + '.txt')
+        origin = os.path.join(config['Paths']['evomag_output'], 'dying_gasp_' + str(currentDate) + shard_suffix + '.txt')
         pathCount = 0
         global latest_path
 
         if (os.path.exists(origin)):
             print('DYING GASP DETECTED -- DEFAULTING TO ' + str(origin) + ' -- SCRAPING FROM LAST KNOW PATH')
         else:
-            print('NO DYING GASP -- DEFAULTING TO evomag_tree.txt')
-            origin = config['Paths']['evomag_output'] + 'evomag_tree.txt' 
+            print('NO DYING GASP -- DEFAULTING TO ' + os.path.basename(args.tree))
+            origin = args.tree
 
         with open(origin, 'r') as origin_file:
             for path in origin_file:
@@ -297,23 +271,41 @@ def main():
                     print(str({e}))
                     with open(config['Paths']['evomag_output'] + 'errLog-' + str(currentDate) + '.txt', 'a') as logs:
                         logs.write('ERR MAIN: ' + str({e}))
+                    driver_pool.page_failed()
                     continue
     finally:
-        #write the remaining categories in dying_gasp from current line to EOF
-        print('PANIC!')
-        with open(config['Paths']['evomag_output'] + 'dying_gasp_' + str(currentDate) + '_tmp.txt', 'w') as gasp:
-            gasp.write(latest_path + '\n')
-
-            with open(origin, 'r') as origin_file:
-                for _ in range(pathCount):
-                    origin_file.readline()
-
-                line = origin_file.readline()
-                gasp.write(line)
-                while(line):
+        # Callbacks run last to first once the dying gasp is written, each one even if
+        # writing the gasp or an earlier close raised, so no resource is left open
+        with ExitStack() as cleanup:
+            cleanup.callback(print_reports)
+            cleanup.callback(page_fetcher.close)
+            cleanup.callback(driver_pool.close)
+            cleanup.callback(output_writer.close)
+            cleanup.callback(fingerprint_cache.close)
+            cleanup.callback(image_downloader.close)
+            cleanup.callback(detail_executor.shutdown, wait=True)
+
+            #write the remaining categories in dying_gasp from current line to EOF
+            print('PANIC!')
+            with open(config['Paths']['evomag_output'] + 'dying_gasp_' + str(currentDate) + shard_suffix + '_tmp.txt', 'w') as gasp:
+                gasp.write(latest_path + '\n')
+
+                with open(origin, 'r') as origin_file:
+                    for _ in range(pathCount):
+                        origin_file.readline()
+
                     line = origin_file.readline()
                     gasp.write(line)
-        os.rename(config['Paths']['evomag_output'] + 'dying_gasp_' + str(currentDate) + '_tmp.txt', config['Paths']['evomag_output'] + 'dying_gasp_' + str(currentDate) + '.txt')
+                    while(line):
+                        line = origin_file.readline()
+                        gasp.write(line)
+            os.rename(config['Paths']['evomag_output'] + 'dying_gasp_' + str(currentDate) + shard_suffix + '_tmp.txt', config['Paths']['evomag_output'] + 'dying_gasp_' + str(currentDate) + shard_suffix + '.txt')
+
+def print_reports():
+    print('evomag image report -- ' + str(image_downloader.report()))
+    print('evomag driver report -- ' + str(driver_pool.report()))
+    print('evomag fetcher report -- ' + str(page_fetcher.report()))
+    print('evomag fingerprint cache report -- ' + str(fingerprint_cache.report()))
         
 
 # scrape('https://www.evomag.ro/telefoane-tablete-accesorii-accesorii-telefoane/filtru/pagina:1')
@@ -1,28 +1,18 @@
 from pymongo import MongoClient, UpdateOne
 from configparser import ConfigParser
-import json
+import os
+import sys
 import datetime
 import subprocess
 import signal
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pipeline'))
+from utils.os_utils import OsUtils
+
 def read_scraper_outputs(output_paths:list[str]):
-    products_list = []
-    for path in output_paths:
-        try:
-            with open(path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                if isinstance(data, list):
-                    products_list.extend(data)
-                elif isinstance(data, dict):
-                    products_list.append(data)
-                    
-            print(f"Processed: {path}")
-        except json.JSONDecodeError:
-            print(f"Error: Could not parse JSON in {path}")
-        except Exception as e:
-            print(f"Error processing {path}: {str(e)}")
-    return products_list
+    # The scrapers write one product per line; the reader also accepts legacy JSON arrays
+    return list(OsUtils.streamFromJsonFile(output_paths))
 
 def scrape_for_interval(script_paths:list[str], cfg:ConfigParser):
     processes = []
@@ -104,8 +94,8 @@ def main():
     
     scrape_for_interval(script_paths, cfg)
     
-    output_paths = [f"{cfg['Paths']['vexio_output']}/vexio_{currentDate}.json",
-                  f"{cfg['Paths']['evomag_output']}/evomag_{currentDate}.json"]
+    output_paths = [f"{cfg['Paths']['vexio_output']}/vexio_{currentDate}.jsonl",
+                  f"{cfg['Paths']['evomag_output']}/evomag_{currentDate}.jsonl"]
     
     scraped_products = read_scraper_outputs(output_paths)
     
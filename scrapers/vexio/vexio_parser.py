@@ -0,0 +1,64 @@
+import re
+
+AVAILABILITY_CLASS = re.compile('availability margin-bottom-xs', re.IGNORECASE)
+
+
+def parse_listing_item(item) -> dict:
+    """
+    Extract the listing-card fields of a vexio product.
+
+    Args:
+        item: First tag inside a product grid cell
+    """
+    manufacturer = item.find_next(class_='manufacturer pull-left').text.strip().lower()
+    name = item.find_next(class_='name').text.strip()
+    isInStoc = item.find_next(class_=AVAILABILITY_CLASS).text.strip()
+    if isInStoc[:2] == 'in':
+        isInStoc = 1
+    else:
+        isInStoc = 0
+
+    itemUrl = item.find_parent().findPreviousSibling().a['href']
+    #TODO -->fix bug when the first image off of every big page gets skipped 
+    try:
+        imageUrl = item.find_previous('img')['data-src']
+    except Exception as e:
+        imageUrl = 'err'
+
+    return {
+        'manufacturer': manufacturer,
+        'name': name,
+        'is_in_stoc': isInStoc,
+        'url': itemUrl,
+        'image_url': imageUrl,
+    }
+
+
+def parse_product_page(soup) -> dict:
+    """
+    Extract the detail-page fields of a vexio product.
+
+    Raises if the page does not contain the expected elements, so callers can
+    retry the page through a browser.
+    """
+    product_code = soup.find(class_='model').text.strip()
+    product_code = product_code.replace('/','+rep+')
+
+    raw_price = soup.find(id='price-value').text
+    if '.' in raw_price:
+        raw_price = raw_price.replace('.','')
+    price = float(raw_price.replace('"','').strip().split(' ')[0].replace(',', '.'))
+
+    specification_dict = {}
+
+    product_specification_keys = soup.find_all(class_='char-name')
+    product_specification_values = soup.find_all(class_='char-value')
+
+    for spec, value in zip(product_specification_keys, product_specification_values):
+        specification_dict[spec.text.strip()] = value.text.strip()
+
+    return {
+        'product_code': product_code,
+        'price': price,
+        'specifications': specification_dict,
+    }
@@ -1,18 +1,22 @@
-import re
 import os
-import json
-import requests
+import sys
+import argparse
 import datetime
 import configparser
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
 
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.firefox.options import Options
-from bs4 import NavigableString
-from bs4 import BeautifulSoup
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.jsonl_writer import JsonlWriter
+from common.page_fetcher import PageFetcher
+from common.rate_limiter import TokenBucket
+from common.image_downloader import ImageDownloader
+from common.html_parser import make_soup, first_tag, resolve_backend
+from vexio_parser import parse_listing_item, parse_product_page
 
 options = Options()
 #options.add_argument('--headless')
@@ -32,75 +36,53 @@ currentDate = datetime.datetime.now().strftime('%Y_%m_%d')
 config = configparser.ConfigParser()
 config.read('/home/tav/Desktop/licenta/cfg.ini')
 
-latest_path = None
-output_file = os.path.join(config['Paths']['vexio_output'], f'vexio_{currentDate}.json')
-
-# Initialize JSON file if it doesn't exist
-if not os.path.exists(output_file):
-    with open(output_file, 'w') as f:
-        json.dump([], f)
+arg_parser = argparse.ArgumentParser(description='vexio scraper')
+arg_parser.add_argument('--tree', default=config['Paths']['vexio_output'] + 'vexio_tree.txt', help='Category tree file to scrape')
+arg_parser.add_argument('--shard', default=None, help='Shard id, suffixes the output and dying gasp files of this worker')
+args = arg_parser.parse_args()
+shard_suffix = '' if args.shard is None else '_shard' + args.shard
 
-def no_nav_strings(iterable):
-    return list(filter(lambda x: type(x) != NavigableString, iterable))
+latest_path = None
+html_backend = resolve_backend(config['Scrapers'].get('html_parser', fallback='lxml'))
+output_file = os.path.join(config['Paths']['vexio_output'], f'vexio_{currentDate}{shard_suffix}.jsonl')
+output_writer = JsonlWriter(output_file)
+page_fetcher = PageFetcher(
+    parser_backend=html_backend,
+    pool_size=config['Scrapers'].getint('vexio_concurrency', fallback=4),
+    rate_limiter=TokenBucket(
+        config['Scrapers'].getfloat('vexio_requests_per_second', fallback=1),
+        config['Scrapers'].getint('vexio_burst', fallback=1)
+    )
+)
+detail_executor = ThreadPoolExecutor(max_workers=config['Scrapers'].getint('vexio_concurrency', fallback=4))
+image_downloader = ImageDownloader(
+    config['Paths']['image_output'],
+    os.path.join(config['Paths']['image_output'], '.image_index_vexio' + shard_suffix + '.json'),
+    config['Paths']['vexio_output'] + 'errLog-' + str(currentDate) + '.txt',
+    workers=config['Scrapers'].getint('image_workers', fallback=2),
+    revalidate=config['Scrapers'].getboolean('image_revalidate', fallback=True)
+)
 
 def format_data(item):
     try:
-        time.sleep(1)
-        manufacturer = item.find_next(class_='manufacturer pull-left').text.strip().lower()
-        name = item.find_next(class_='name').text.strip()
-        isInStoc = item.find_next(class_=re.compile('availability margin-bottom-xs', re.IGNORECASE)).text.strip()
-        test = isInStoc[:2]
-        if isInStoc[:2] == 'in':
-            isInStoc = 1
-        else:
-            isInStoc = 0
-
-        itemUrl = item.find_parent().findPreviousSibling().a['href']
-        #TODO -->fix bug when the first image off of every big page gets skipped 
-        try:
-            imageUrl = item.find_previous('img')['data-src']
-            #imageUrl = item.find_parent().findPreviousSibling().find_next('img')['data-src']
-        except Exception as e:
-            imageUrl = 'err'
-
-        driver.delete_all_cookies()
-        driver.get(itemUrl)
-        page_source = driver.page_source
-        other_soup = BeautifulSoup(page_source, 'html.parser')
-
-        #WebDriverWait(driver, 2).until( EC.presence_of_all_elements_located )
-
-        product_code = other_soup.find(class_='model').text.strip()
-        product_code = product_code.replace('/','+rep+')
-
-        raw_price = other_soup.find(id='price-value').text
-        if '.' in raw_price:
-            raw_price = raw_price.replace('.','')
-        price = float(raw_price.replace('"','').strip().split(' ')[0].replace(',', '.'))
+        listing = parse_listing_item(item)
+        manufacturer = listing['manufacturer']
+        name = listing['name']
+        isInStoc = listing['is_in_stoc']
+        itemUrl = listing['url']
+        imageUrl = listing['image_url']
 
-        specification_dict = {}
+        # Server-rendered HTML first, the browser only if that page does not parse
+        details = page_fetcher.fetch(itemUrl, parse_product_page, driver)
 
-        product_specification_keys = other_soup.find_all(class_='char-name')
-        product_specification_values = other_soup.find_all(class_='char-value')
-
-        for spec, value in zip(product_specification_keys, product_specification_values):
-            specification_dict[spec.text.strip()] = value.text.strip()
+        product_code = details['product_code']
+        price = details['price']
+        specification_dict = details['specifications']
 
         #=====scraping image===== 
         # TODO --> Fa sa mearga la un moment dat...  
-        img_name = 'not_found.jpeg'
         if imageUrl != 'err':
-            try:
-                img_data = requests.get(imageUrl).content
-                img_name = product_code + '.jpeg'
-                #
-                filepath = os.path.join(config['Paths']['image_output'], img_name) 
-                with open(filepath, 'wb') as file:
-                    file.write(img_data)
-            except Exception as e:
-                with open(config['Paths']['vexio_output'] + 'errLog-' + str(currentDate) + '.txt', 'a') as logs:
-                    logs.write('ERR FOR IMAGE SCRAPING: ' + name)
-                    logs.write('ERR: ' + str({e}) + '\n')
+            image_downloader.submit(imageUrl, product_code + '.jpeg', name)
         #=====scraping image=====
 
         print('vexio -- ' + name)
@@ -129,6 +111,16 @@ def format_data(item):
             logs.write('ERR: ' + str({e}) + '\n')
         return None
 
+def settle_detail_futures(futures):
+    # A page left early must not keep detail fetches running on the shared driver and
+    # pool: cancel the ones not started yet and wait for the running ones
+    for future in futures:
+        future.cancel()
+    wait(futures)
+
+def scrape_item(element):
+    return format_data(first_tag(element))
+
 def scrape(path : str):
     target_url = path
 
@@ -151,51 +143,43 @@ def scrape(path : str):
 
         current_page+=1
         page_source = driver.page_source
-        soup = BeautifulSoup(page_source, 'html.parser')
+        soup = make_soup(page_source, html_backend)
         
         li_items = soup.find_all(class_="grid-full col-xs-8 col-sm-4 col-md-4")
         category = soup.find(class_='breadcrumb').text.strip().split('\xa0')[-1]
         next_page_button = soup.find(class_ = 'pagination-next')
         
-        # Process items in batches
-        batch_size = 10
-        for i in range(0, len(li_items), batch_size):
-            batch_items = li_items[i:i + batch_size]
-            batch_data = []
-            
-            for element in batch_items:
-                try:
-                    element = no_nav_strings(element.descendants)
-                    formatted_dict = format_data(element[0])
-                    if formatted_dict:
-                        formatted_dict['category'] = category
-                        batch_data.append(formatted_dict)
-                except Exception as e:
-                    print(str({e}))
-                    with open(config['Paths']['vexio_output'] + 'errLog-' + str(currentDate) + '.txt', 'a') as logs:
-                        logs.write('ON PATH:' + path +  '\n' + 'PAGE:' + str(current_page) + '\n')
-                        logs.write('ERR: ' + str({e}) + '\n')
-                    continue
-            
-            # Append batch to JSON file if we have data
-            if batch_data:
-                # Read existing data
-                try:
-                    with open(output_file, 'r') as f:
-                        try:
-                            existing_data = json.load(f)
-                        except json.JSONDecodeError:
-                            existing_data = []
-                except FileNotFoundError:
-                    existing_data = []
+        # Detail pages are fetched concurrently, results are written in listing order
+        futures = [detail_executor.submit(scrape_item, element) for element in li_items]
+
+        try:
+            # Process items in batches
+            batch_size = 10
+            for i in range(0, len(futures), batch_size):
+                batch_futures = futures[i:i + batch_size]
+                batch_data = []
                 
-                # Append new data and write back
-                existing_data.extend(batch_data)
-                with open(output_file, 'w') as f:
-                    json.dump(existing_data, f, indent=2)
-            
-            # Clear batch data from memory
-            batch_data.clear()
+                for future in batch_futures:
+                    try:
+                        formatted_dict = future.result()
+                        if formatted_dict:
+                            formatted_dict['category'] = category
+                            batch_data.append(formatted_dict)
+                    except Exception as e:
+                        print(str({e}))
+                        with open(config['Paths']['vexio_output'] + 'errLog-' + str(currentDate) + '.txt', 'a') as logs:
+                            logs.write('ON PATH:' + path +  '\n' + 'PAGE:' + str(current_page) + '\n')
+                            logs.write('ERR: ' + str({e}) + '\n')
+                        continue
+                
+                # Append batch to JSONL file if we have data
+                if batch_data:
+                    output_writer.write_batch(batch_data)
+                
+                # Clear batch data from memory
+                batch_data.clear()
+        finally:
+            settle_detail_futures(futures)
 
         if (next_page_button == None):
             break
@@ -209,14 +193,14 @@ def scrape(path : str):
 def main():
     try:
         print(os.getcwd())  
-        origin = os.path.join(config['Paths']['vexio_output'], 'dying_gasp_' + str(currentDate) + '.txt')
+        origin = os.path.join(config['Paths']['vexio_output'], 'dying_gasp_' + str(currentDate) + shard_suffix + '.txt')
         pathCount=0
 
         if (os.path.exists(origin)):
             print('DYING GASP DETECTED -- DEFAULTING TO ' + str(origin) + ' -- SCRAPING FROM LAST KNOWN PATH')
         else:
-            print('NO DYING GASP -- DEFAULTING TO vexio_tree.txt')
-            origin = config['Paths']['vexio_output'] + 'vexio_tree.txt' 
+            print('NO DYING GASP -- DEFAULTING TO ' + os.path.basename(args.tree))
+            origin = args.tree
 
         with open(origin, 'r') as origin_file:
             for path in origin_file:
@@ -236,22 +220,35 @@ def main():
                     driver.delete_all_cookies()
                     continue
     finally:
-        #write the remaining lines in dying_gasp from current line to EOF
-        print('PANIC!')
-        with open(config['Paths']['vexio_output'] + 'dying_gasp_' + str(currentDate) + '_tmp.txt', 'w') as gasp:
-            gasp.write(latest_path + '\n')
-
-            with open(origin, 'r') as origin_file:
-                for _ in range(pathCount):
-                    origin_file.readline()
-
-                line = origin_file.readline()
-                gasp.write(line)
-                while(line):
+        # Callbacks run last to first once the dying gasp is written, each one even if
+        # writing the gasp or an earlier close raised, so no resource is left open
+        with ExitStack() as cleanup:
+            cleanup.callback(driver.quit)
+            cleanup.callback(print_reports)
+            cleanup.callback(page_fetcher.close)
+            cleanup.callback(output_writer.close)
+            cleanup.callback(image_downloader.close)
+            cleanup.callback(detail_executor.shutdown, wait=True)
+
+            #write the remaining lines in dying_gasp from current line to EOF
+            print('PANIC!')
+            with open(config['Paths']['vexio_output'] + 'dying_gasp_' + str(currentDate) + shard_suffix + '_tmp.txt', 'w') as gasp:
+                gasp.write(latest_path + '\n')
+
+                with open(origin, 'r') as origin_file:
+                    for _ in range(pathCount):
+                        origin_file.readline()
+
                     line = origin_file.readline()
                     gasp.write(line)
-        os.rename(config['Paths']['vexio_output'] +  'dying_gasp_' + str(currentDate) + '_tmp.txt', config['Paths']['vexio_output'] + 'dying_gasp_' + str(currentDate) + '.txt')
-        driver.quit()
+                    while(line):
+                        line = origin_file.readline()
+                        gasp.write(line)
+            os.rename(config['Paths']['vexio_output'] +  'dying_gasp_' + str(currentDate) + shard_suffix + '_tmp.txt', config['Paths']['vexio_output'] + 'dying_gasp_' + str(currentDate) + shard_suffix + '.txt')
+
+def print_reports():
+    print('vexio image report -- ' + str(image_downloader.report()))
+    print('vexio fetcher report -- ' + str(page_fetcher.report()))
 
 if __name__ == "__main__":
     main()
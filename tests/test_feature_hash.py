@@ -0,0 +1,55 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'pipeline'))
+from regression_manager.dataset_cleanup_manager import DatasetCleanupManager
+
+PHONE = {
+    'product_code': 'P0000001',
+    'specifications': {
+        '5G': 'Da',
+        '4G': 'Da',
+        'Rezolutie maxima (px)': '1080 x 2400',
+        'Diagonala (inch)': '6.5',
+        'Numar nuclee': '8 (2+6)',
+        'Memorie Flash': '128 GB',
+        'Memorie RAM': '8 GB',
+        'Incarcare Wireless': 'Nu',
+        'Capacitate': '5000 mAh',
+        'Dual SIM': 'Da',
+    },
+}
+
+OTHER_PHONES = [
+    {'product_code': 'P0000002', 'specifications': {'4G': 'Optional', 'Diagonala (inch)': 'n/a'}},
+    {'product_code': 'P0000003', 'specifications': {'5G': 'Nu', 'Rezolutie maxima (px)': 'Full HD', 'Memorie RAM': '12 GB'}},
+]
+
+
+def hash_of_first(products):
+    return DatasetCleanupManager.feature_hashes(DatasetCleanupManager().clean_dataset(products))[0]
+
+
+def test_feature_hash_does_not_depend_on_other_rows():
+    alone = hash_of_first([PHONE])
+    assert hash_of_first([PHONE] + OTHER_PHONES) == alone
+    assert hash_of_first([PHONE] + OTHER_PHONES[:1]) == alone
+    assert hash_of_first([PHONE] + OTHER_PHONES[1:]) == alone
+
+
+def test_feature_hash_changes_with_features():
+    changed = {**PHONE, 'specifications': {**PHONE['specifications'], 'Memorie RAM': '12 GB'}}
+    assert hash_of_first([changed]) != hash_of_first([PHONE])
+
+
+def test_feature_hashes_do_not_depend_on_chunking():
+    products = [PHONE] + OTHER_PHONES
+    cleanup_manager = DatasetCleanupManager()
+    whole = DatasetCleanupManager.feature_hashes(cleanup_manager.clean_dataset(products))
+    chunked = [
+        feature_hash
+        for offset in range(len(products))
+        for feature_hash in DatasetCleanupManager.feature_hashes(cleanup_manager.clean_dataset(products[offset:offset + 1]))
+    ]
+    assert chunked == whole
@@ -0,0 +1,41 @@
+import os
+import sys
+import json
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'pipeline'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from regression_manager.dataset_cleanup_manager import DatasetCleanupManager
+from regression_manager.forest_artifact import ForestArtifact
+from regression_manager.model_registry import ModelRegistry
+from test_feature_hash import PHONE, OTHER_PHONES
+
+
+def registry_with_model(tmp_path, products):
+    features = DatasetCleanupManager().clean_dataset(products).apply(pd.to_numeric, errors='coerce').fillna(0)
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(features, np.arange(len(features)) * 100.0)
+    ForestArtifact.export(model, str(tmp_path / 'model'))
+    with open(tmp_path / 'registry.json', 'w', encoding='utf-8') as registry_file:
+        json.dump({'Telefoane': {'model_path': 'model', 'feature_spec': 'phone'}}, registry_file)
+    return ModelRegistry(str(tmp_path / 'registry.json'))
+
+
+def test_product_with_non_numeric_feature_does_not_fail_its_chunk(tmp_path):
+    # OTHER_PHONES[0] answers 4G with 'Optional', which the cleaner keeps as a string
+    products = [PHONE] + OTHER_PHONES
+    registry = registry_with_model(tmp_path, products)
+
+    updates, report = registry.predict_category('Telefoane', products, 'v1')
+    prices = {update['product_code']: update['recommended_price'] for update in updates}
+    assert report['scored'] == 2 and report['unscored'] == 1
+    assert prices['P0000002'] is None
+    assert prices['P0000001'] is not None and prices['P0000003'] is not None
+
+    # Stamped with the version and hash, the unscored product is not retried
+    stamped = [{**product, **update} for product, update in zip(products, updates)]
+    _, report = registry.predict_category('Telefoane', stamped, 'v1')
+    assert report['skipped'] == 3 and report['unscored'] == 0